@@ -1,27 +1,173 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.admin.options import get_content_type_for_model
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Length, Replace
+from django.urls import reverse_lazy
+from django.forms.models import BaseModelFormSet
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.html import format_html
+from .cache import invalidate_model
 from .models import *
 
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, use the planner's row estimate instead of COUNT(*) once a
+    changelist is big enough that an exact count is both slow and unhelpful.
+    Small results are still counted exactly.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            estimate = plan[0]['Plan']['Plan Rows']
+            if estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+class ExistingObjectChoiceField(forms.ModelChoiceField):
+    """Resolve a row's hidden pk from its formset's queryset rather than with a query per row."""
+    def __init__(self, formset, *args, **kwargs):
+        self.formset = formset
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            obj = self.formset._existing_object(self.formset._pk_field.to_python(value))
+        except ValidationError:
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return obj
+
+class ListEditableFormSet(BaseModelFormSet):
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        name = self._pk_field.name
+        field = form.fields[name]
+        form.fields[name] = ExistingObjectChoiceField(
+            self, field.queryset, initial=field.initial, required=False, widget=field.widget,
+        )
+
+class LargeTableAdminMixin:
+    """
+    Changelist tuning for tables with tens of thousands of rows:
+
+    - estimated counts, and no second unfiltered count for the filter sidebar;
+    - ``changelist_defer`` columns (large text) aren't selected for the list;
+    - ``list_editable`` changes are written with one ``bulk_update()`` and
+      one ``LogEntry`` insert per submit instead of a ``save()`` per row.
+      Model ``save()`` overrides and save signals don't run, so only list
+      plain fields here.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    changelist_defer = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if self.changelist_defer and match and match.url_name == '%s_%s_changelist' % (self.opts.app_label, self.opts.model_name):
+            queryset = queryset.defer(*self.changelist_defer)
+        return queryset
+
+    def get_changelist_formset(self, request, **kwargs):
+        return super().get_changelist_formset(request, formset=ListEditableFormSet, **kwargs)
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST' or '_save' not in request.POST:
+            return super().changelist_view(request, extra_context)
+        request._list_editable_batch = []
+        request._list_editable_log = []
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            response = super().changelist_view(request, extra_context)
+            self._save_list_editable_batch(request._list_editable_batch)
+            LogEntry.objects.bulk_create(request._list_editable_log)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        batch = getattr(request, '_list_editable_batch', None)
+        if batch is None or not change:
+            return super().save_model(request, obj, form, change)
+        batch.append((obj, form.changed_data))
+
+    def log_change(self, request, obj, message):
+        log = getattr(request, '_list_editable_log', None)
+        if log is None:
+            return super().log_change(request, obj, message)
+        log.append(LogEntry(
+            user_id=request.user.pk,
+            content_type_id=get_content_type_for_model(obj).pk,
+            object_id=str(obj.pk),
+            object_repr=str(obj)[:200],
+            action_flag=CHANGE,
+            change_message=json.dumps(message) if isinstance(message, list) else message,
+        ))
+
+    def _save_list_editable_batch(self, batch):
+        if not batch:
+            return
+        objs = [obj for obj, changed_data in batch]
+        fields = {name for obj, changed_data in batch for name in changed_data}
+        for field in self.opts.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for obj in objs:
+                    field.pre_save(obj, add=False)
+                fields.add(field.name)
+        self.model._default_manager.bulk_update(objs, sorted(fields), batch_size=500)
+        # bulk_update() sends no save signals.
+        invalidate_model(self.model)
+
 class PostAdminForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = '__all__'
         widgets = {
-            'markdown_content': forms.Textarea(attrs={'rows': 25, 'style': 'width: 90%; font-family: monospace;'}),
+            'markdown_content': forms.Textarea(attrs={
+                'rows': 25, 'style': 'width: 90%; font-family: monospace;',
+                'data-preview-url': reverse_lazy('post_preview'),
+            }),
             'excerpt': forms.Textarea(attrs={'rows': 3}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        publish_at = cleaned_data.get('publish_at')
+        if cleaned_data.get('is_published') and publish_at and publish_at > timezone.now():
+            self.add_error('is_published', "Leave this unchecked for scheduled posts; they go live automatically at the publish time.")
+        return cleaned_data
+
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     form = PostAdminForm
-    list_display = ['title', 'author', 'published_date', 'is_published', 'is_featured']
+    list_display = ['title', 'author', 'published_date', 'is_published', 'is_featured', 'publish_at']
     list_editable = ['is_published', 'is_featured']
     list_filter = ['is_published', 'is_featured', 'published_date', 'tags']
     search_fields = ['title', 'markdown_content', 'excerpt']
     prepopulated_fields = {'slug': ('title',)}
     filter_horizontal = ['tags']
     readonly_fields = ['published_date', 'updated_date', 'preview_link']
+    changelist_defer = ['markdown_content', 'excerpt']
+
+    class Media:
+        js = ['core/js/post_preview.js']
+        css = {'all': ['css/pygments.css', 'core/css/post_preview.css']}
     
     fieldsets = (
         ('Basic Information', {
@@ -31,7 +177,7 @@ class PostAdmin(admin.ModelAdmin):
             'fields': ('markdown_content', 'header_image')
         }),
         ('Publication', {
-            'fields': ('is_published', 'is_featured', 'published_date', 'updated_date')
+            'fields': ('is_published', 'publish_at', 'is_featured', 'published_date', 'updated_date')
         }),
         ('Preview', {
             'fields': ('preview_link',),
@@ -42,12 +188,28 @@ class PostAdmin(admin.ModelAdmin):
     def preview_link(self, obj):
         if obj.id:
             return format_html(
-                '<a href="{}" target="_blank" class="button">View Post on Site</a>',
-                obj.get_absolute_url()
+                '<a href="{}" target="_blank" class="button">{}</a>',
+                obj.get_absolute_url(),
+                'View Post on Site' if obj.is_published else 'Preview Draft on Site',
             )
         return "Save post first to preview"
     preview_link.short_description = "Post Preview"
 
+    def get_search_results(self, request, queryset, search_term):
+        # On PostgreSQL, use full-text search instead of an ILIKE scan over
+        # every post body.
+        if search_term and connections[queryset.db].vendor == 'postgresql':
+            from django.contrib.postgres.search import SearchQuery, SearchVector
+
+            vector = (
+                SearchVector('title', weight='A')
+                + SearchVector('excerpt', weight='B')
+                + SearchVector('markdown_content', weight='C')
+            )
+            queryset = queryset.annotate(search=vector).filter(search=SearchQuery(search_term, search_type='websearch'))
+            return queryset, False
+        return super().get_search_results(request, queryset, search_term)
+
 class ProjectImageInline(admin.TabularInline):
     model = ProjectImage
     extra = 1
@@ -61,13 +223,14 @@ class ProjectImageInline(admin.TabularInline):
     image_preview.short_description = "Preview"
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'featured', 'completion_date', 'order', 'technology_count']
     list_editable = ['featured', 'order']
     list_filter = ['featured', 'completion_date']
     search_fields = ['title', 'short_description', 'technologies']
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ProjectImageInline]
+    changelist_defer = ['short_description', 'long_description']
     
     fieldsets = (
         (None, {
@@ -81,9 +244,16 @@ class ProjectAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Count the comma-separated technologies in SQL rather than per row.
+        return super().get_queryset(request).annotate(
+            _technology_count=Length('technologies') - Length(Replace('technologies', Value(','), Value(''))) + 1,
+        )
+
     def technology_count(self, obj):
-        return len(obj.get_technologies_list())
+        return obj._technology_count
     technology_count.short_description = 'Tech Count'
+    technology_count.admin_order_field = '_technology_count'
 
 @admin.register(Skill)
 class SkillAdmin(admin.ModelAdmin):
@@ -104,6 +274,7 @@ class SkillAdmin(admin.ModelAdmin):
     
     def reset_skill_levels(self, request, queryset):
         updated = queryset.update(level=50)
+        invalidate_model(Skill)
         self.message_user(request, f'Successfully reset {updated} skills to level 50.')
     reset_skill_levels.short_description = "Reset selected skills to level 50"
 
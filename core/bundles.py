@@ -0,0 +1,445 @@
+"""
+Content bundles: every ``core`` model, tag relations and uploaded files in
+one gzipped tar, for moving a site's content between environments.
+
+A bundle holds ``manifest.json`` (format version, row counts and media
+names), then one ``<app>.<model>.jsonl`` file per model with a JSON object
+per row, then ``media/<name>`` for each file a row refers to. Rows point at
+each other by natural key (slugs and the like), never by primary key, so a
+bundle can be imported into a database that already has content.
+
+``MediaBlob`` rows aren't exported: importing a file through the storage
+creates them again.
+"""
+import datetime
+import decimal
+import hashlib
+import io
+import os
+import json
+import tarfile
+import tempfile
+import time
+import zlib
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import models, transaction
+from django.utils import timezone
+
+from .cache import NAMESPACES, invalidate
+from .storage import ContentAddressedMixin, digest_name
+
+FORMAT = 'portfolio-content'
+FORMAT_VERSION = 1
+
+BATCH_SIZE = 1000
+
+# Models in dependency order, with the fields that identify a row across
+# databases. An empty key means a single-row model matched by position.
+NATURAL_KEYS = {
+    'core.SiteSettings': (),
+    'core.About': (),
+    'core.Skill': ('name',),
+    'core.Tag': ('slug',),
+    'core.Project': ('slug',),
+    'core.ProjectImage': ('project', 'image'),
+    'core.Education': ('degree', 'institution'),
+    'core.Certification': ('title', 'issuer'),
+    'core.Extracurricular': ('title', 'organization'),
+    'core.Post': ('slug',),
+    'core.ContactMessage': ('email', 'created_at'),
+}
+
+ON_CONFLICT_CHOICES = ('update', 'skip', 'error')
+
+
+class BundleError(Exception):
+    pass
+
+
+def member_name(model):
+    return f'{model._meta.label_lower}.jsonl'
+
+
+def _fields(model):
+    return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def _encode(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def _natural_key_field(model):
+    key = NATURAL_KEYS[model._meta.label]
+    if len(key) != 1:
+        raise BundleError(f'{model._meta.label} needs a single-field natural key to be referenced.')
+    return key[0]
+
+
+def _natural_keys_by_pk(model):
+    return dict(model._base_manager.values_list('pk', _natural_key_field(model)))
+
+
+def _pks_by_natural_key(model):
+    return {key: pk for pk, key in model._base_manager.values_list('pk', _natural_key_field(model))}
+
+
+def _key_value(obj, field):
+    value = getattr(obj, field.attname)
+    return value.name if isinstance(field, models.FileField) else value
+
+
+def _add_member(tar, name, fileobj, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    tar.addfile(info, fileobj)
+
+
+# Export
+
+def export_bundle(fileobj, include_media=True):
+    """
+    Write a bundle to ``fileobj``, which only needs to support ``write()``,
+    so the bundle can be streamed to stdout. Returns the manifest.
+    """
+    counts = {}
+    media = {}
+    spooled = []
+    for label in NATURAL_KEYS:
+        model = apps.get_model(label)
+        data = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        counts[label] = 0
+        for row, files in _export_rows(model):
+            data.write(json.dumps(row, default=_encode, ensure_ascii=False).encode() + b'\n')
+            counts[label] += 1
+            media.update(files)
+        spooled.append((member_name(model), data))
+
+    if include_media:
+        media = {name: storage for name, storage in media.items() if storage.exists(name)}
+    manifest = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'exported_at': timezone.now().isoformat(),
+        'models': counts,
+        'media': sorted(media) if include_media else [],
+    }
+
+    with tarfile.open(fileobj=fileobj, mode='w|gz') as tar:
+        encoded = json.dumps(manifest, indent=2).encode()
+        _add_member(tar, 'manifest.json', io.BytesIO(encoded), len(encoded))
+        for name, data in spooled:
+            size = data.tell()
+            data.seek(0)
+            _add_member(tar, name, data, size)
+            data.close()
+        for name in manifest['media']:
+            storage = media[name]
+            with storage.open(name, 'rb') as f:
+                _add_member(tar, f'media/{name}', f, storage.size(name))
+    return manifest
+
+
+def _export_rows(model):
+    """Yield ``(row, {file name: storage})`` for every row of ``model``."""
+    fields = _fields(model)
+    related = {
+        field.name: _natural_keys_by_pk(field.related_model)
+        for field in fields if field.is_relation
+    }
+    m2m = {}
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        keys = _natural_keys_by_pk(field.related_model)
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        values = m2m[field.name] = {}
+        for pk, related_pk in through.objects.values_list(f'{source}_id', f'{target}_id'):
+            values.setdefault(pk, []).append(keys[related_pk])
+
+    for obj in model._base_manager.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        row = {}
+        files = {}
+        for field in fields:
+            value = field.value_from_object(obj)
+            if field.is_relation:
+                value = related[field.name].get(value)
+            elif isinstance(field, models.FileField):
+                value = value.name or ''
+                if value:
+                    files[value] = field.storage
+            row[field.name] = value
+        for name, values in m2m.items():
+            row[name] = sorted(values.get(obj.pk, []))
+        yield row, files
+
+
+# Import
+
+def read_manifest(tar):
+    try:
+        manifest = json.load(tar.extractfile('manifest.json'))
+    except KeyError:
+        raise BundleError('Not a content bundle: manifest.json is missing.')
+    except ValueError as e:
+        raise BundleError(f'manifest.json is not valid JSON: {e}')
+    if not isinstance(manifest, dict) or manifest.get('format') != FORMAT:
+        raise BundleError('Not a content bundle: unknown format.')
+    if manifest.get('version', 0) > FORMAT_VERSION:
+        raise BundleError(
+            f'Bundle format version {manifest["version"]} is newer than this site supports ({FORMAT_VERSION}).'
+        )
+    return manifest
+
+
+def import_bundle(path, on_conflict='update', dry_run=False):
+    """
+    Load the bundle at ``path`` in one transaction. Rows whose natural key
+    already exists are updated, skipped or rejected per ``on_conflict``.
+    Returns ``{label: {'created': n, 'updated': n, 'skipped': n}}``.
+    """
+    if on_conflict not in ON_CONFLICT_CHOICES:
+        raise ValueError(f'on_conflict must be one of {ON_CONFLICT_CHOICES}')
+
+    try:
+        return _import_bundle(path, on_conflict, dry_run)
+    except (tarfile.TarError, EOFError, zlib.error) as e:
+        raise BundleError(f'Not a readable bundle: {e}')
+
+
+def _import_bundle(path, on_conflict, dry_run):
+    with tarfile.open(path, mode='r:*') as tar, tempfile.TemporaryDirectory() as spool:
+        manifest = read_manifest(tar)
+        media = spool_media(tar, set(manifest.get('media', [])), spool)
+        stats = {}
+        with transaction.atomic():
+            for label in NATURAL_KEYS:
+                if label not in manifest['models']:
+                    continue
+                model = apps.get_model(label)
+                importer = ModelImporter(model, tar, media, on_conflict, save_files=not dry_run)
+                stats[label] = importer.run()
+            # bulk_create/bulk_update send no signals.
+            invalidate(*NAMESPACES)
+            if dry_run:
+                transaction.set_rollback(True)
+    return stats
+
+
+def spool_media(tar, names, directory):
+    """
+    Copy the bundle's media files into ``directory`` in one pass in archive
+    order, since seeking back in a gzip stream decompresses it again from
+    the start. Returns ``{name: (path, sha256 hex digest)}``.
+    """
+    media = {}
+    for member in tar:
+        name = member.name[len('media/'):]
+        if not member.isfile() or not member.name.startswith('media/') or name not in names:
+            continue
+        path = os.path.join(directory, str(len(media)))
+        digest = hashlib.sha256()
+        with tar.extractfile(member) as source, open(path, 'wb') as target:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(chunk)
+                target.write(chunk)
+        media[name] = (path, digest.hexdigest())
+    missing = names - media.keys()
+    if missing:
+        raise BundleError(f'Media listed in the manifest but missing: {", ".join(sorted(missing))}.')
+    return media
+
+
+class ModelImporter:
+    def __init__(self, model, tar, media, on_conflict, save_files=True):
+        self.model = model
+        self.tar = tar
+        self.media = media
+        self.on_conflict = on_conflict
+        self.save_files = save_files
+        self.fields = _fields(model)
+        self.key = NATURAL_KEYS[model._meta.label]
+        self.file_fields = [field for field in self.fields if isinstance(field, models.FileField)]
+        self.auto_fields = [
+            field for field in self.fields
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        ]
+        self.related = {
+            field.name: _pks_by_natural_key(field.related_model)
+            for field in self.fields if field.is_relation
+        }
+        self.m2m = {
+            field.name: (field, _pks_by_natural_key(field.related_model))
+            for field in model._meta.many_to_many
+        }
+        self.existing = self._existing_keys()
+        self.seen = set()
+        # Bundle media name -> stored name, and stored name -> bundle media name.
+        self.stored_names = {}
+        self.sources = {}
+        self.stats = {'created': 0, 'updated': 0, 'skipped': 0}
+
+    def _existing_keys(self):
+        manager = self.model._base_manager.order_by('pk')
+        if not self.key:
+            return {(position,): pk for position, pk in enumerate(manager.values_list('pk', flat=True))}
+        attnames = [self.model._meta.get_field(name).attname for name in self.key]
+        return {tuple(values): pk for pk, *values in manager.values_list('pk', *attnames)}
+
+    def run(self):
+        try:
+            member = self.tar.extractfile(member_name(self.model))
+        except KeyError:
+            raise BundleError(f'{member_name(self.model)} is listed in the manifest but missing.')
+        batch = []
+        for position, line in enumerate(member):
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise BundleError(f'{member_name(self.model)} line {position + 1} is not valid JSON: {e}')
+            batch.append(self.build(position, row))
+            if len(batch) >= BATCH_SIZE:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        return self.stats
+
+    def build(self, position, row):
+        """Return ``(key, instance, m2m values)`` for one bundle row."""
+        obj = self.model()
+        for field in self.fields:
+            value = row.get(field.name)
+            if field.is_relation:
+                if value is not None:
+                    try:
+                        value = self.related[field.name][value]
+                    except KeyError:
+                        raise BundleError(f'{self.model._meta.label}: unknown {field.name} {value!r}.')
+                setattr(obj, field.attname, value)
+            elif field.name in row:
+                try:
+                    value = field.to_python(value)
+                except ValidationError as e:
+                    raise BundleError(f'{self.model._meta.label}: invalid {field.name} {value!r} ({"; ".join(e.messages)}).')
+                setattr(obj, field.attname, value)
+        key = self.natural_key(obj, position)
+        if self.file_fields:
+            # Match rows on the names files get once stored, so importing the
+            # same bundle again finds the rows the first import created.
+            for field in self.file_fields:
+                setattr(obj, field.attname, self.stored_name(field, getattr(obj, field.attname).name))
+            stored_key = self.natural_key(obj, position)
+            # Keep the bundle's name only to match a row that still uses it.
+            if stored_key in self.existing or key not in self.existing:
+                key = stored_key
+        return key, obj, {name: row.get(name, []) for name in self.m2m}
+
+    def natural_key(self, obj, position):
+        return tuple(_key_value(obj, self.model._meta.get_field(name)) for name in self.key) or (position,)
+
+    def stored_name(self, field, name):
+        """The name ``field``'s storage will give the bundled file ``name``."""
+        if not name or name not in self.media:
+            return name
+        stored = self.stored_names.get(name)
+        if stored is None:
+            stored = name
+            if isinstance(field.storage, ContentAddressedMixin):
+                stored = digest_name(name, self.media[name][1])
+            self.stored_names[name] = stored
+            self.sources[stored] = name
+        return stored
+
+    def flush(self, batch):
+        creates, updates = [], []
+        for key, obj, m2m in batch:
+            if key in self.seen:
+                self.stats['skipped'] += 1
+                continue
+            self.seen.add(key)
+            pk = self.existing.get(key)
+            if pk is None:
+                creates.append((key, obj, m2m))
+            elif self.on_conflict == 'error':
+                raise BundleError(f'{self.model._meta.label} {key!r} already exists.')
+            elif self.on_conflict == 'skip':
+                self.stats['skipped'] += 1
+            else:
+                obj.pk = pk
+                updates.append((key, obj, m2m))
+
+        self.store_files(creates, updates)
+        fields = [field.name for field in self.fields]
+        if creates:
+            objs = [obj for _, obj, _ in creates]
+            originals = [[getattr(obj, field.attname) for field in self.auto_fields] for obj in objs]
+            self.model._base_manager.bulk_create(objs, batch_size=BATCH_SIZE)
+            if any(obj.pk is None for obj in objs):
+                # The backend can't return primary keys from a bulk insert.
+                self.existing = self._existing_keys()
+                for key, obj, _ in creates:
+                    obj.pk = self.existing[key]
+            for key, obj, _ in creates:
+                self.existing[key] = obj.pk
+            if self.auto_fields:
+                # bulk_create stamps auto_now(_add) fields; put the exported values back.
+                for obj, values in zip(objs, originals):
+                    for field, value in zip(self.auto_fields, values):
+                        setattr(obj, field.attname, value)
+                self.model._base_manager.bulk_update(objs, [field.name for field in self.auto_fields], batch_size=BATCH_SIZE)
+        if updates and fields:
+            self.model._base_manager.bulk_update([obj for _, obj, _ in updates], fields, batch_size=BATCH_SIZE)
+        self.set_relations(creates + updates)
+        self.stats['created'] += len(creates)
+        self.stats['updated'] += len(updates)
+
+    def store_files(self, creates, updates):
+        """
+        Save files that rows now refer to through their field's storage, and
+        release the ones updated rows no longer use.
+        """
+        if not self.file_fields:
+            return
+        current = {}
+        if updates:
+            attnames = [field.attname for field in self.file_fields]
+            current = {
+                pk: dict(zip(attnames, values))
+                for pk, *values in self.model._base_manager.filter(
+                    pk__in=[obj.pk for _, obj, _ in updates],
+                ).values_list('pk', *attnames)
+            }
+        for _, obj, _ in creates + updates:
+            old = current.get(obj.pk, {})
+            for field in self.file_fields:
+                name = getattr(obj, field.attname).name or ''
+                previous = old.get(field.attname) or ''
+                if name == previous:
+                    continue
+                source = self.sources.get(name)
+                if source and self.save_files:
+                    with open(self.media[source][0], 'rb') as content:
+                        setattr(obj, field.attname, field.storage.save(source, File(content, name=source)))
+                if previous and self.save_files:
+                    transaction.on_commit(lambda storage=field.storage, name=previous: storage.delete(name))
+
+    def set_relations(self, rows):
+        for name, (field, pks) in self.m2m.items():
+            through = field.remote_field.through
+            source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+            through.objects.filter(**{f'{source}__in': [obj.pk for _, obj, _ in rows]}).delete()
+            links = []
+            for _, obj, m2m in rows:
+                for value in m2m[name]:
+                    try:
+                        links.append(through(**{source: obj.pk, target: pks[value]}))
+                    except KeyError:
+                        raise BundleError(f'{self.model._meta.label}: unknown {name} {value!r}.')
+            through.objects.bulk_create(links, batch_size=BATCH_SIZE)
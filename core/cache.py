@@ -0,0 +1,131 @@
+"""
+Versioned cache namespaces.
+
+Cached fragments and pages are keyed on the current version token of each namespace
+they depend on. Saving or deleting a model replaces the tokens of its
+namespaces (see ``core.signals``), so stale entries are never read again
+instead of having to be found and deleted.
+
+Tokens live in the default cache, so a bump only reaches the processes that
+share it. That cache must be shared by every web worker and management
+command (see ``CACHES`` in settings), never a per-process ``LocMemCache``.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+from .minify import minify_html
+
+VERSION_KEY = 'ns-version:{}'
+SETTLE_KEY = 'ns-settle:{}'
+PAGE_KEY = 'page:{}:{}'
+
+# Cache namespaces fed by each content model.
+MODEL_NAMESPACES = {
+    'core.SiteSettings': ('site',),
+    'core.About': ('about',),
+    'core.Skill': ('skills',),
+    'core.Project': ('projects',),
+    'core.ProjectImage': ('projects',),
+    'core.Education': ('education',),
+    'core.Certification': ('certifications',),
+    'core.Extracurricular': ('extracurriculars',),
+    'core.Post': ('posts',),
+    'core.Tag': ('posts',),
+    'core.Post_tags': ('posts',),
+}
+
+NAMESPACES = sorted({namespace for namespaces in MODEL_NAMESPACES.values() for namespace in namespaces})
+
+
+def _new_token():
+    # Random rather than incrementing, so a version evicted from the cache can
+    # never come back as a value that old entries were stored under.
+    return uuid.uuid4().hex[:12]
+
+
+def get_versions(namespaces=NAMESPACES):
+    """Return ``{namespace: token}`` for ``namespaces`` in a single cache round trip."""
+    keys = {VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    settle_keys = {SETTLE_KEY.format(namespace): namespace for namespace in namespaces} if settings.DATABASE_REPLICAS else {}
+    found = cache.get_many([*keys, *settle_keys])
+    # Namespaces whose replicas should have caught up since the last write:
+    # bump once more to orphan anything cached from lagging reads meanwhile.
+    settled = [key for key in settle_keys if key in found and found[key] <= time.time()]
+    if settled:
+        cache.delete_many(settled)
+        for key in settled:
+            found.pop(VERSION_KEY.format(settle_keys[key]), None)
+    missing = {key: _new_token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {namespace: found[key] for key, namespace in keys.items()}
+
+
+def bump(*namespaces):
+    """Give ``namespaces`` new version tokens, orphaning everything cached under the old ones."""
+    cache.set_many({VERSION_KEY.format(namespace): _new_token() for namespace in namespaces}, None)
+
+
+def invalidate(*namespaces):
+    """
+    Invalidate ``namespaces`` now and again once the current transaction
+    commits, so a request that re-cached old rows in between isn't served.
+    With read replicas, the first ``get_versions()`` after
+    ``REPLICA_PIN_SECONDS`` bumps them a third time, for pages rendered from
+    replicas that hadn't caught up with the commit yet.
+    """
+    bump(*namespaces)
+    transaction.on_commit(lambda: _bump_committed(namespaces))
+
+
+def _bump_committed(namespaces):
+    bump(*namespaces)
+    if settings.DATABASE_REPLICAS:
+        settle_at = time.time() + settings.REPLICA_PIN_SECONDS
+        cache.set_many({SETTLE_KEY.format(namespace): settle_at for namespace in namespaces}, None)
+
+
+def invalidate_model(model):
+    """Invalidate every namespace fed by ``model``, e.g. after a ``queryset.update()``."""
+    namespaces = MODEL_NAMESPACES.get(model._meta.label)
+    if namespaces:
+        invalidate(*namespaces)
+
+
+def page_cache_key(request, namespaces, query_params=()):
+    """
+    Key for the page at ``request``'s path, as of the current versions of
+    ``namespaces``. Only the ``query_params`` the view reads are part of the
+    key, so arbitrary query strings can't fill the cache with copies.
+    """
+    query = [(param, request.GET.get(param)) for param in query_params if param in request.GET]
+    url = hashlib.md5(repr((request.path, query)).encode()).hexdigest()
+    versions = get_versions(namespaces)
+    return PAGE_KEY.format(url, '.'.join(versions[namespace] for namespace in namespaces))
+
+
+def get_cached_page(key):
+    """Return ``(content, content_type)`` for a cached page, or None."""
+    page = cache.get(key)
+    metrics.CACHE_REQUESTS.inc(cache='page', result='miss' if page is None else 'hit')
+    return page
+
+
+def set_cached_page(key, response):
+    """
+    Store ``response`` under ``key``. HTML is minified first, here rather than
+    per request, and the response itself is given the minified body too.
+    """
+    content_type = response['Content-Type']
+    if content_type.startswith('text/html'):
+        original = response.content
+        response.content = minify_html(original.decode(response.charset)).encode(response.charset)
+        metrics.BYTES_SAVED.inc(len(original) - len(response.content), method='minify')
+    cache.set(key, (response.content, content_type), settings.PAGE_CACHE_TIMEOUT)
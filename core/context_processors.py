@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_versions
+
+
+def cache_versions(request):
+    """
+    Expose namespace version tokens for ``{% cache %}`` keys, e.g.
+    ``{% cache fragment_cache_timeout home_skills cache_versions.skills %}``.
+    Tokens are only fetched if a template actually uses them.
+    """
+    return {
+        'cache_versions': SimpleLazyObject(get_versions),
+        'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,91 @@
+"""
+Cached syntax highlighting for Markdown code blocks.
+
+``CachedCodeHiliteExtension`` is a drop-in for markdown's ``codehilite``
+that routes every code block through ``highlight()``. Results are kept in a
+per-process LRU and in the cache framework, keyed by a hash of the code,
+language, style and options, so a snippet is only lexed once no matter how
+many posts or workers render it.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.core.cache import cache
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension, HiliteTreeprocessor
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+from markdown.preprocessors import Preprocessor
+
+from . import metrics
+
+MEMORY_CACHE_SIZE = 512
+
+HIGHLIGHT_KEY = 'highlight:{}'
+
+
+def highlight(code, lang, config, shebang=False):
+    """Return the HTML CodeHilite produces for ``code`` with ``config``."""
+    return _highlight(code, lang or '', tuple(sorted(config.items())), shebang)
+
+
+@lru_cache(maxsize=MEMORY_CACHE_SIZE)
+def _highlight(code, lang, config, shebang):
+    key = HIGHLIGHT_KEY.format(hashlib.sha256(repr((code, lang, config, shebang)).encode()).hexdigest())
+    html = cache.get(key)
+    metrics.CACHE_REQUESTS.inc(cache='highlight', result='miss' if html is None else 'hit')
+    if html is None:
+        options = dict(config)
+        style = options.pop('pygments_style', 'default')
+        html = CodeHilite(code, lang=lang or None, style=style, **options).hilite(shebang=shebang)
+        cache.set(key, html, None)
+    return html
+
+
+class CachedFencedBlockPreprocessor(Preprocessor):
+    """
+    Highlight fenced blocks through the cache before ``fenced_code`` runs.
+    Blocks with attribute lists or ``hl_lines`` are left to ``fenced_code``.
+    """
+    def __init__(self, md, config):
+        super().__init__(md)
+        self.config = config
+
+    def run(self, lines):
+        if not self.config['use_pygments']:
+            return lines
+
+        def replace(match):
+            if match.group('attrs') or match.group('hl_lines'):
+                return match.group(0)
+            html = highlight(match.group('code'), match.group('lang'), self.config)
+            return f'\n{self.md.htmlStash.store(html)}\n'
+
+        text = FencedBlockPreprocessor.FENCED_BLOCK_RE.sub(replace, '\n'.join(lines))
+        return text.split('\n')
+
+
+class CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    """Highlight indented code blocks through the cache."""
+    def run(self, root):
+        config = dict(self.config, tab_length=self.md.tab_length)
+        for block in root.iter('pre'):
+            if len(block) == 1 and block[0].tag == 'code':
+                html = highlight(self.code_unescape(block[0].text), None, config, shebang=True)
+                placeholder = self.md.htmlStash.store(html)
+                block.clear()
+                block.tag = 'p'
+                block.text = placeholder
+
+
+class CachedCodeHiliteExtension(CodeHiliteExtension):
+    def extendMarkdown(self, md):
+        config = self.getConfigs()
+        hiliter = CachedHiliteTreeprocessor(md)
+        hiliter.config = config
+        md.treeprocessors.register(hiliter, 'hilite', 30)
+        # Ahead of fenced_code (25), which still handles the blocks we skip.
+        md.preprocessors.register(CachedFencedBlockPreprocessor(md, config), 'cached_fenced_code', 26)
+        md.registerExtension(self)
+
+
+def makeExtension(**kwargs):
+    return CachedCodeHiliteExtension(**kwargs)
@@ -0,0 +1,111 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import PostAdmin
+from core.models import Post, Project, Tag
+
+BODY = ('Hydraulic systems convert fluid pressure into mechanical work. ' * 40).strip()
+
+
+class Command(BaseCommand):
+    help = 'Measures Post and Project admin changelist latency against a large generated table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Rows per table to benchmark against (default: 100000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Requests per scenario (default: 5)')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated rows instead of rolling them back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['rows'])
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost')
+            client.force_login(get_user_model().objects.create_superuser('changelist-bench', password=None))
+
+            post_url = reverse('admin:core_post_changelist')
+            project_url = reverse('admin:core_project_changelist')
+            scenarios = [
+                ('posts', post_url, {}),
+                ('posts, page 50', post_url, {'p': 49}),
+                ('posts, search', post_url, {'q': 'post 4242'}),
+                ('posts, published filter', post_url, {'is_published__exact': 1}),
+                ('posts, tag filter', post_url, {'tags__id__exact': Tag.objects.values_list('pk', flat=True).first()}),
+                ('projects', project_url, {}),
+                ('projects, by tech count', project_url, {'o': 5}),
+            ]
+
+            self.stdout.write(f'{"scenario":<26} {"median":>10} {"max":>10} {"queries":>8}')
+            for name, url, params in scenarios:
+                self.report(name, [self.timed(lambda: client.get(url, params)) for _ in range(options['repeat'])])
+
+            self.report('posts, list_editable save', [
+                self.timed(lambda data=self.list_editable_data(): client.post(post_url, data))
+                for _ in range(options['repeat'])
+            ])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def populate(self, rows):
+        self.stdout.write(f'Generating {rows} posts and projects...')
+        tags = Tag.objects.bulk_create([Tag(name=f'Bench tag {i}', slug=f'bench-tag-{i}') for i in range(20)])
+        posts = Post.objects.bulk_create((
+            Post(
+                title=f'Benchmark post {i}', slug=f'benchmark-post-{i}', markdown_content=BODY,
+                excerpt=BODY[:150], is_published=i % 3 != 0, is_featured=i % 50 == 0,
+            )
+            for i in range(rows)
+        ), batch_size=2000)
+        Post.tags.through.objects.bulk_create((
+            Post.tags.through(post_id=post.pk, tag_id=tags[i % len(tags)].pk)
+            for i, post in enumerate(posts)
+        ), batch_size=5000)
+        Project.objects.bulk_create((
+            Project(
+                title=f'Benchmark project {i}', slug=f'benchmark-project-{i}', short_description=BODY[:200],
+                long_description=BODY, technologies=', '.join(['CAD', 'MATLAB', 'C++', 'Arduino'][:i % 4 + 1]),
+                featured=i % 100 == 0, order=i % 10,
+            )
+            for i in range(rows)
+        ), batch_size=2000)
+
+    def timed(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code in (200, 302), response.status_code
+        return elapsed, len(queries)
+
+    def report(self, name, samples):
+        timings = [elapsed for elapsed, _ in samples]
+        self.stdout.write(
+            f'{name:<26} {statistics.median(timings):7.1f} ms {max(timings):7.1f} ms {samples[-1][1]:>8}'
+        )
+
+    def list_editable_data(self):
+        """POST data toggling is_featured on every row of the first changelist page."""
+        rows = Post.objects.order_by('-published_date', '-pk').values('pk', 'is_published', 'is_featured')
+        rows = list(rows[:PostAdmin.list_per_page])
+        data = {
+            '_save': 'Save', 'action': '',
+            'form-TOTAL_FORMS': len(rows), 'form-INITIAL_FORMS': len(rows),
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+        }
+        for i, row in enumerate(rows):
+            data[f'form-{i}-id'] = row['pk']
+            if row['is_published']:
+                data[f'form-{i}-is_published'] = 'on'
+            if not row['is_featured']:
+                data[f'form-{i}-is_featured'] = 'on'
+        return data
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Writes the Pygments stylesheet for PYGMENTS_STYLE into the static assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(Path(settings.STATICFILES_DIRS[0]) / 'css' / 'pygments.css'),
+                            help='Stylesheet path (default: assets/css/pygments.css)')
+
+    def handle(self, *args, **options):
+        from pygments.formatters import HtmlFormatter
+
+        css = HtmlFormatter(style=settings.PYGMENTS_STYLE).get_style_defs('.codehilite')
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            f'/* Generated by manage.py build_pygments_css ({settings.PYGMENTS_STYLE}) */\n{css}\n', newline='\n',
+        )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
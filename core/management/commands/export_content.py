@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.bundles import export_bundle
+
+
+class Command(BaseCommand):
+    help = 'Exports all portfolio content, tag relations and uploaded files as a versioned .tar.gz bundle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Bundle path, or - to stream it to stdout')
+        parser.add_argument('--no-media', action='store_true',
+                            help="Leave uploaded files out; rows still refer to them by name")
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            manifest = export_bundle(sys.stdout.buffer, include_media=not options['no_media'])
+            sys.stdout.buffer.flush()
+            out = self.stderr
+        else:
+            with open(options['output'], 'wb') as f:
+                manifest = export_bundle(f, include_media=not options['no_media'])
+            out = self.stdout
+
+        for label, count in manifest['models'].items():
+            out.write(f'{label:<24} {count:>8}')
+        out.write(f'{"media files":<24} {len(manifest["media"]):>8}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bundles import ON_CONFLICT_CHOICES, BundleError, import_bundle
+
+
+class Command(BaseCommand):
+    help = 'Imports a bundle written by export_content, matching existing rows by slug or other natural key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bundle', help='Path to the .tar.gz bundle')
+        parser.add_argument('--on-conflict', choices=ON_CONFLICT_CHOICES, default='update',
+                            help='What to do with rows that already exist (default: update)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change, then roll back')
+
+    def handle(self, *args, **options):
+        try:
+            stats = import_bundle(options['bundle'], on_conflict=options['on_conflict'], dry_run=options['dry_run'])
+        except (BundleError, OSError) as e:
+            raise CommandError(e)
+
+        self.stdout.write(f'{"model":<24} {"created":>8} {"updated":>8} {"skipped":>8}')
+        for label, counts in stats.items():
+            self.stdout.write(f'{label:<24} {counts["created"]:>8} {counts["updated"]:>8} {counts["skipped"]:>8}')
+        if options['dry_run']:
+            self.stdout.write('Dry run: nothing was saved.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Import complete.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.scheduling import next_publish_at, publish_due_posts
+
+
+class Command(BaseCommand):
+    help = 'Publishes posts whose publish_at time has passed. Run from cron, or with --loop as a worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, waking up when the next post is due')
+        parser.add_argument('--interval', type=float, default=60,
+                            help='Longest time to sleep between checks in --loop mode, in seconds (default: 60)')
+
+    def handle(self, *args, **options):
+        while True:
+            published = publish_due_posts()
+            if published:
+                self.stdout.write(self.style.SUCCESS(f'Published {published} scheduled post(s)'))
+            if not options['loop']:
+                break
+
+            close_old_connections()
+            delay = options['interval']
+            next_at = next_publish_at()
+            if next_at is not None:
+                delay = min(delay, max((next_at - timezone.now()).total_seconds(), 1))
+            time.sleep(delay)
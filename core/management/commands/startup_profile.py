@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import DEFAULT_BUDGET_MS, DEFERRED_MODULES, ENTRY_POINTS, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Reports per-module import time for the WSGI/ASGI entry points'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entry', choices=sorted(ENTRY_POINTS), default='wsgi',
+                            help='Entry point to boot (default: wsgi)')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of modules to list in each table (default: 20)')
+        parser.add_argument('--depth', type=int, default=2,
+                            help='Deepest import nesting shown by cumulative time (default: 2)')
+        parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                            help=f'Fail if cold start takes longer than this (default: {DEFAULT_BUDGET_MS})')
+
+    def handle(self, *args, **options):
+        profile = profile_startup(options['entry'])
+
+        # Nearly everything nests under the entry point, so show the heaviest
+        # subtrees a few levels down, then the modules that are slow themselves.
+        self.write_table(
+            f'Slowest imports up to depth {options["depth"]}, by cumulative time:',
+            [timing for timing in profile.imports if timing.depth <= options['depth']],
+            lambda timing: timing.cumulative_us, options['top'], nested=True,
+        )
+        self.write_table(
+            'Slowest modules by self time:',
+            profile.imports, lambda timing: timing.self_us, options['top'],
+        )
+
+        imported = {timing.module.split('.')[0] for timing in profile.imports}
+        eager = [module for module in DEFERRED_MODULES if module in imported]
+        if eager:
+            self.stdout.write(self.style.WARNING(f'Imported at startup but should be deferred: {", ".join(eager)}'))
+
+        summary = f'{options["entry"]} cold start: {profile.total_ms:.1f} ms ({len(profile.imports)} modules)'
+        if profile.total_ms > options['budget_ms']:
+            raise CommandError(f'{summary}, over the {options["budget_ms"]:.0f} ms budget')
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def write_table(self, title, timings, key, top, nested=False):
+        self.stdout.write(title)
+        self.stdout.write(f'{"cumulative":>12} {"self":>10}  module')
+        for timing in sorted(timings, key=key, reverse=True)[:top]:
+            self.stdout.write(
+                f'{timing.cumulative_us / 1000:9.1f} ms {timing.self_us / 1000:7.1f} ms  '
+                f'{"  " * timing.depth if nested else ""}{timing.module}'
+            )
+        self.stdout.write('')
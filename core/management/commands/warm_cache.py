@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import URLPattern, reverse
+
+from core import urls as core_urls
+from core.models import Post, Project
+
+# URL names that take a slug, and where to find the slugs to warm.
+SLUG_SOURCES = {
+    'post_detail': lambda: Post.objects.filter(is_published=True).values_list('slug', flat=True),
+    'project_detail': lambda: Project.objects.values_list('slug', flat=True),
+}
+
+# Form, preview and monitoring endpoints are not pages to warm.
+SKIPPED_URLS = {'contact', 'post_preview', 'metrics'}
+
+# Cache backends whose entries only exist in the process that wrote them.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Warms the page and fragment caches by requesting every public URL, and fails if any page is over budget. '
+        'Use --base-url to warm and time the running server itself; without it pages are rendered in this process, '
+        'which only helps the server through a shared cache backend and only times this process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of URLs requested in parallel (default: 4)')
+        parser.add_argument('--budget-ms', type=float, default=500,
+                            help='Fail if any warm response takes longer than this (default: 500)')
+        parser.add_argument('--base-url', default='',
+                            help='Running server to warm (e.g. http://127.0.0.1:8000). Without it the test client '
+                                 'renders pages in this process, which needs a shared cache backend')
+        parser.add_argument('--host', default='',
+                            help='Host header for the test client (default: first entry of ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        urls = list(self.collect_urls())
+        if not urls:
+            raise CommandError('No URLs found in core.urls')
+
+        self.base_url = options['base_url'].rstrip('/')
+        backend = settings.CACHES['default']['BACKEND']
+        if not self.base_url and backend in PROCESS_LOCAL_CACHES:
+            raise CommandError(
+                f'The default cache ({backend}) only lives in this process, so warming it here would leave the '
+                'server cold. Pass --base-url to warm the running server, or configure a shared cache backend.'
+            )
+        self.host = options['host'] or (settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost')
+        self.local = threading.local()
+
+        self.stdout.write(f'Warming {len(urls)} URLs with concurrency {options["concurrency"]}...')
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            results = list(pool.map(self.warm, urls))
+
+        budget = options['budget_ms']
+        failures = []
+        for url, status, cold_ms, warm_ms in results:
+            line = f'{status}  cold {cold_ms:8.1f} ms  warm {warm_ms:8.1f} ms  {url}'
+            if status != 200:
+                failures.append(f'{url} returned {status}')
+                self.stdout.write(self.style.ERROR(line))
+            elif warm_ms > budget:
+                failures.append(f'{url} took {warm_ms:.1f} ms (budget {budget:.0f} ms)')
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError('Readiness check failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'All {len(urls)} URLs warm and within {budget:.0f} ms'))
+
+    def collect_urls(self):
+        for pattern in core_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIPPED_URLS:
+                continue
+            if pattern.pattern.converters:
+                source = SLUG_SOURCES.get(pattern.name)
+                if source is None:
+                    continue
+                for slug in source().iterator():
+                    yield reverse(pattern.name, kwargs={'slug': slug})
+            else:
+                yield reverse(pattern.name)
+
+    def warm(self, url):
+        """Request ``url`` twice: the first request fills the caches, the second measures them."""
+        try:
+            status, cold_ms = self.fetch(url)
+            if status == 200:
+                status, warm_ms = self.fetch(url)
+            else:
+                warm_ms = cold_ms
+        finally:
+            # Each worker thread opens its own database connection.
+            connections.close_all()
+        return url, status, cold_ms, warm_ms
+
+    def fetch(self, url):
+        start = time.perf_counter()
+        if self.base_url:
+            try:
+                with urlopen(self.base_url + url, timeout=30) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except URLError as e:
+                raise CommandError(f'Could not reach {self.base_url}: {e.reason}')
+        else:
+            client = getattr(self.local, 'client', None)
+            if client is None:
+                client = self.local.client = Client(raise_request_exception=False, HTTP_HOST=self.host)
+            status = client.get(url).status_code
+        return status, (time.perf_counter() - start) * 1000
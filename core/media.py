@@ -0,0 +1,124 @@
+"""
+Serving uploaded media: conditional requests, single byte ranges and
+web-server offload (X-Accel-Redirect / X-Sendfile).
+"""
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .storage import IMMUTABLE_CACHE_CONTROL, is_content_addressed
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Parse a ``Range`` header against a file of ``size`` bytes.
+
+    Returns an inclusive ``(start, end)`` pair, or None if the whole file
+    should be sent (no header, a malformed one, or several ranges, which we
+    don't serve as multipart). Raises ``RangeNotSatisfiable`` if the range
+    lies entirely past the end of the file.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, sep, last = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def media_response(request, name, path, stat):
+    """Build the response for the media file ``name`` stored at ``path``."""
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    last_modified = http_date(stat.st_mtime)
+    headers = {
+        'Last-Modified': last_modified,
+        'ETag': etag,
+        # Content-addressed names never change meaning; anything else must revalidate.
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if is_content_addressed(name) else 'no-cache',
+    }
+
+    # Returns a 304/412 if a precondition applies, otherwise the probe itself.
+    probe = HttpResponse(headers=headers)
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime), response=probe)
+    if conditional is not probe:
+        return conditional
+
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'x-accel-redirect':
+        # nginx serves the file itself, including Range requests.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _python_response(request, path, stat, content_type, etag, last_modified)
+        response['Accept-Ranges'] = 'bytes'
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _python_response(request, path, stat, content_type, etag, last_modified):
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, last_modified):
+        # The client's partial copy is stale: send the whole file.
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, stat.st_size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range is None:
+        # FileResponse hands the open file to wsgi.file_wrapper, which lets the
+        # server use sendfile() instead of copying through Python.
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(iter_file_range(path, start, length), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Content-Length'] = str(length)
+    return response
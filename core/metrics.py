@@ -0,0 +1,284 @@
+"""
+Counters and histograms exported in the Prometheus text format.
+
+With ``METRICS_DIR`` set, every process keeps its values in its own
+memory-mapped file in that directory and ``/metrics`` sums all of them, so
+the numbers are correct across gunicorn workers. Clear the directory when
+the server starts; files left by workers that have since exited keep
+counting towards the totals, which is what counters should do. Without
+``METRICS_DIR`` values live in process memory, which is fine for
+``runserver`` and tests.
+
+Updating a value is a dict lookup and an in-place write under a lock, cheap
+enough to call on every request.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+
+class MemoryStore:
+    """Values for this process only."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class MmapStore:
+    """
+    Values in a memory-mapped file. The file starts with the number of bytes
+    in use, followed by entries of a key length, the key padded to 8 bytes,
+    and a float64 value, so other processes can read it without locking.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.INITIAL_SIZE
+            self._file.truncate(size)
+        self._size = size
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = struct.unpack_from('<i', self._mmap, 0)[0]
+        self._positions = {}
+        if self._used == 0:
+            self._used = 8
+            struct.pack_into('<i', self._mmap, 0, self._used)
+        else:
+            self._positions = {key: pos for key, _, pos in _read_entries(self._mmap, self._used)}
+
+    def inc(self, key, amount):
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._positions[key] = self._add(key)
+            value = struct.unpack_from('<d', self._mmap, pos)[0]
+            struct.pack_into('<d', self._mmap, pos, value + amount)
+
+    def _add(self, key):
+        encoded = key.encode()
+        padded = encoded + b' ' * (-(len(encoded) + 4) % 8)
+        entry = struct.pack(f'<i{len(padded)}sd', len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._size:
+            self._size *= 2
+            self._file.truncate(self._size)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._size)
+        self._mmap[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        # Publish the entry only once it is fully written.
+        struct.pack_into('<i', self._mmap, 0, self._used)
+        return self._used - 8
+
+    def items(self):
+        with self._lock:
+            return [(key, value) for key, value, _ in _read_entries(self._mmap, self._used)]
+
+
+def _read_entries(data, used):
+    pos = 8
+    while pos < used:
+        length = struct.unpack_from('<i', data, pos)[0]
+        key = bytes(data[pos + 4:pos + 4 + length]).decode()
+        pos += 4 + length + (-(length + 4) % 8)
+        yield key, struct.unpack_from('<d', data, pos)[0], pos
+        pos += 8
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    used = min(struct.unpack_from('<i', data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _read_entries(data, used)]
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """This process's store, reopened after a fork so workers never share a file."""
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                directory = getattr(settings, 'METRICS_DIR', '')
+                _store = MmapStore(os.path.join(directory, f'{pid}.db')) if directory else MemoryStore()
+                _store_pid = pid
+    return _store
+
+
+def collect():
+    """Sum of every value, across all processes when ``METRICS_DIR`` is set."""
+    directory = getattr(settings, 'METRICS_DIR', '')
+    if not directory:
+        return dict(get_store().items())
+    totals = {}
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        for key, value in _read_file(path):
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def _key(self, suffix, labels, extra=()):
+        cache_key = (suffix, tuple(labels.items()), extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            if set(labels) != set(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+            pairs = [[name, str(labels[name])] for name in self.labelnames] + [list(pair) for pair in extra]
+            key = self._keys[cache_key] = json.dumps([self.name, self.name + suffix, pairs])
+        return key
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        get_store().inc(self._key('', labels), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+
+    def observe(self, value, **labels):
+        # Buckets are stored individually and made cumulative on export.
+        bucket = next(b for b in self.buckets if value <= b)
+        store = get_store()
+        store.inc(self._key('_bucket', labels, (('le', _format_value(bucket)),)), 1)
+        store.inc(self._key('_count', labels), 1)
+        store.inc(self._key('_sum', labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+REGISTRY = {}
+
+
+def _format_value(value):
+    return '+Inf' if value == math.inf else repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _sample_line(name, pairs, value):
+    labels = ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in pairs)
+    return f'{name}{{{labels}}} {_format_value(value)}' if labels else f'{name} {_format_value(value)}'
+
+
+def exposition():
+    """Render every registered metric in the Prometheus text format."""
+    samples = {}
+    for key, value in collect().items():
+        family, name, pairs = json.loads(key)
+        samples.setdefault(family, []).append((name, pairs, value))
+
+    lines = []
+    for family, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {family} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {family} {metric.type}')
+        if metric.type == 'histogram':
+            lines.extend(_histogram_lines(family, samples.get(family, [])))
+        else:
+            for name, pairs, value in sorted(samples.get(family, []), key=lambda s: s[1]):
+                lines.append(_sample_line(name, pairs, value))
+    return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(family, samples):
+    series = {}
+    for name, pairs, value in samples:
+        labels = tuple(tuple(pair) for pair in pairs if pair[0] != 'le')
+        entry = series.setdefault(labels, {'buckets': {}, 'count': 0.0, 'sum': 0.0})
+        if name.endswith('_bucket'):
+            le = float(dict(pairs)['le'])
+            entry['buckets'][le] = entry['buckets'].get(le, 0.0) + value
+        elif name.endswith('_count'):
+            entry['count'] += value
+        else:
+            entry['sum'] += value
+
+    metric = REGISTRY[family]
+    for labels, entry in sorted(series.items()):
+        cumulative = 0.0
+        for bucket in metric.buckets:
+            cumulative += entry['buckets'].get(bucket, 0.0)
+            yield _sample_line(f'{family}_bucket', labels + (('le', _format_value(bucket)),), cumulative)
+        yield _sample_line(f'{family}_count', labels, entry['count'])
+        yield _sample_line(f'{family}_sum', labels, entry['sum'])
+
+
+REQUESTS = Counter(
+    'portfolio_http_requests_total', 'HTTP requests by view, method and status code.',
+    ('view', 'method', 'status'),
+)
+REQUEST_SECONDS = Histogram(
+    'portfolio_http_request_duration_seconds', 'Time spent handling a request, by view.', ('view',),
+)
+CONTACT_SUBMISSIONS = Counter(
+    'portfolio_contact_submissions_total', 'Contact form submissions by result.', ('result',),
+)
+MAIL_SEND_SECONDS = Histogram(
+    'portfolio_mail_send_duration_seconds', 'Time spent sending contact notification mail.',
+)
+MAIL_SEND_ERRORS = Counter(
+    'portfolio_mail_send_errors_total', 'Contact notification mails that failed to send.',
+)
+BYTES_SAVED = Counter(
+    'portfolio_response_bytes_saved_total', 'Bytes saved on responses by brotli, gzip or HTML minification.',
+    ('method',),
+)
+CACHE_REQUESTS = Counter(
+    'portfolio_cache_requests_total', 'Cache lookups by cache and result (hit or miss).',
+    ('cache', 'result'),
+)
@@ -0,0 +1,156 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from . import metrics, routers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is used without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+_ENCODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+class MetricsMiddleware:
+    """Count requests and time them per view. Goes first in ``MIDDLEWARE``."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view)
+        return response
+
+
+def accepted_encodings(header):
+    """Content codings ``header`` (an Accept-Encoding value) allows."""
+    accepted = set()
+    for item in header.split(','):
+        match = _ENCODING_RE.match(item)
+        if match and (match.group(2) is None or _quality(match.group(2)) > 0):
+            accepted.add(match.group(1).lower())
+    return accepted
+
+
+def _quality(value):
+    try:
+        return float(value)
+    except ValueError:
+        return 0
+
+
+class CompressionMiddleware:
+    """
+    Brotli- or gzip-compress text responses of at least
+    ``RESPONSE_COMPRESSION_MIN_LENGTH`` bytes. Streaming responses (media,
+    exports) are passed through untouched, and responses with a CSRF token
+    are only ever gzipped.
+    """
+    # As in django.middleware.gzip, pad gzip output to blunt BREACH.
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_LENGTH
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        # Brotli has no header field to pad like gzip's, so responses that
+        # carry a CSRF token (get_token() was called) get padded gzip instead.
+        carries_secret = request.META.get('CSRF_COOKIE_NEEDS_UPDATE', False)
+        if brotli is not None and 'br' in accepted and not carries_secret:
+            encoding = 'br'
+            compressed = brotli.compress(response.content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+
+        saved = len(response.content) - len(compressed)
+        if saved <= 0:
+            return response
+        metrics.BYTES_SAVED.inc(saved, method=encoding)
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The body no longer matches a strong validator.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class ReadReplicaMiddleware:
+    """
+    Read from a replica in views with ``use_read_replica = True``. Staff, unsafe
+    methods and clients that have just submitted something (and carry the pin
+    cookie) stay on the primary, so they always see their own writes. A
+    request whose replica fails with a database error is served again from
+    the primary.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.route_reads_to(None)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        if (
+            settings.DATABASE_REPLICAS
+            and getattr(view, 'use_read_replica', False)
+            and request.method in ('GET', 'HEAD')
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+            and not request.user.is_staff
+        ):
+            routers.route_reads_to(routers.choose_replica())
+            request._replica_view = (view_func, view_args, view_kwargs)
+
+    def process_exception(self, request, exception):
+        # A replica that failed mid-request: take it out of rotation and
+        # serve the request from the primary instead of a 500.
+        alias = routers.current_replica()
+        if alias is None or not isinstance(exception, DatabaseError):
+            return None
+        routers.mark_down(alias)
+        routers.route_reads_to(None)
+        view_func, view_args, view_kwargs = request._replica_view
+        response = view_func(request, *view_args, **view_kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
@@ -0,0 +1,157 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='About',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(default='I am a goal-oriented mechanical engineering student with a passion for problem-solving and innovation...')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Certification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('issuer', models.CharField(max_length=200)),
+                ('issue_date', models.DateField(blank=True, null=True)),
+                ('credential_url', models.URLField(blank=True)),
+                ('in_progress', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-issue_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContactMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80)),
+                ('email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(blank=True, max_length=140)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('read', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Education',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('degree', models.CharField(max_length=200)),
+                ('institution', models.CharField(max_length=200)),
+                ('period', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('current', models.BooleanField(default=False)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Extracurricular',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('organization', models.CharField(max_length=200)),
+                ('role', models.CharField(blank=True, max_length=100)),
+                ('period', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('current', models.BooleanField(default=False)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Project',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=128)),
+                ('slug', models.SlugField(blank=True, unique=True)),
+                ('short_description', models.TextField()),
+                ('long_description', models.TextField(blank=True)),
+                ('featured', models.BooleanField(default=False)),
+                ('technologies', models.CharField(help_text='Comma-separated list of technologies', max_length=200)),
+                ('github_url', models.URLField(blank=True)),
+                ('demo_url', models.URLField(blank=True)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('completion_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SiteSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_name', models.CharField(default="Muwemi's Portfolio", max_length=64)),
+                ('hero_title', models.CharField(default='Mechanical Engineering Innovator', max_length=128)),
+                ('hero_subtitle', models.TextField(default='Specializing in hydraulic systems, automation, and sustainable energy solutions')),
+                ('profile_image', models.ImageField(blank=True, null=True, upload_to='profile/')),
+                ('resume', models.FileField(blank=True, null=True, upload_to='documents/')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('level', models.PositiveSmallIntegerField(help_text='0-100')),
+                ('category', models.CharField(choices=[('ENG', 'Engineering'), ('PROG', 'Programming'), ('DESIGN', 'Design'), ('SOFT', 'Soft Skills')], default='ENG', max_length=10)),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['category', '-level', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(blank=True, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='projects/')),
+                ('caption', models.CharField(blank=True, max_length=140)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='core.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Post',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(blank=True, unique=True)),
+                ('author', models.CharField(default='Muwemi Ndovie', max_length=80)),
+                ('markdown_content', models.TextField(help_text='Write your post using Markdown syntax')),
+                ('excerpt', models.TextField(blank=True, help_text='Brief summary of the post')),
+                ('header_image', models.ImageField(blank=True, null=True, upload_to='blog/')),
+                ('published_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('is_published', models.BooleanField(default=False)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('tags', models.ManyToManyField(blank=True, related_name='blog_posts', to='core.tag')),
+            ],
+            options={
+                'ordering': ['-published_date'],
+            },
+        ),
+    ]
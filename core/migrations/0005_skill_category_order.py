@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_post_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='skill',
+            options={'ordering': [models.OrderBy(models.Case(models.When(category='ENG', then=models.Value(0)), models.When(category='PROG', then=models.Value(1)), models.When(category='DESIGN', then=models.Value(2)), models.When(category='SOFT', then=models.Value(3)), default=models.Value(4), output_field=models.IntegerField())), 'order', 'name']},
+        ),
+    ]
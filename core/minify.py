@@ -0,0 +1,22 @@
+"""
+Whitespace minification for rendered HTML.
+
+Only runs of whitespace that contain a line break are touched: each becomes
+a single newline, which the browser treats exactly like the original run.
+That strips template indentation and blank lines without changing what a
+page renders. ``<pre>``, ``<textarea>``, ``<script>`` and ``<style>`` bodies
+are left as they are.
+"""
+import re
+
+_PRESERVED_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+
+_LINE_BREAK_RE = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+
+def minify_html(html):
+    parts = _PRESERVED_RE.split(html)
+    # split() yields text, preserved element, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        parts[i] = _LINE_BREAK_RE.sub('\n', parts[i])
+    return ''.join(part for i, part in enumerate(parts) if i % 3 != 2).strip()
@@ -3,6 +3,16 @@ from django.utils.text import slugify
 from django.utils import timezone
 from django.urls import reverse
 
+class MediaBlob(models.Model):
+    """A content-addressed media file and the number of fields referencing it."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
 class SiteSettings(models.Model):
     site_name = models.CharField(max_length=64, default="Muwemi's Portfolio")
     hero_title = models.CharField(max_length=128, default="Mechanical Engineering Innovator")
@@ -19,21 +29,29 @@ class About(models.Model):
     def __str__(self):
         return 'About Section'
 
+# In display order.
+SKILL_CATEGORIES = [
+    ('ENG', 'Engineering'),
+    ('PROG', 'Programming'),
+    ('DESIGN', 'Design'),
+    ('SOFT', 'Soft Skills'),
+]
+
+# A category's position in SKILL_CATEGORIES, so the database can sort by it.
+SKILL_CATEGORY_RANK = models.Case(
+    *(models.When(category=code, then=models.Value(rank)) for rank, (code, label) in enumerate(SKILL_CATEGORIES)),
+    default=models.Value(len(SKILL_CATEGORIES)),
+    output_field=models.IntegerField(),
+)
+
 class Skill(models.Model):
-    SKILL_CATEGORIES = [
-        ('ENG', 'Engineering'),
-        ('PROG', 'Programming'),
-        ('DESIGN', 'Design'),
-        ('SOFT', 'Soft Skills'),
-    ]
-    
     name = models.CharField(max_length=64)
     level = models.PositiveSmallIntegerField(help_text="0-100")
     category = models.CharField(max_length=10, choices=SKILL_CATEGORIES, default='ENG')
     order = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
-        ordering = ['category', '-level', 'name']
+        ordering = [SKILL_CATEGORY_RANK.asc(), 'order', 'name']
 
 class Project(models.Model):
     title = models.CharField(max_length=128)
@@ -141,11 +159,17 @@ class Post(models.Model):
     published_date = models.DateTimeField(default=timezone.now)
     updated_date = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
+    publish_at = models.DateTimeField(blank=True, null=True, db_index=True, help_text="Leave unpublished to go live automatically at this time")
     is_featured = models.BooleanField(default=False)
     tags = models.ManyToManyField('Tag', blank=True, related_name='blog_posts')
     
     class Meta:
         ordering = ['-published_date']
+        indexes = [
+            models.Index(fields=['is_published', '-published_date'], name='core_post_published_idx'),
+            # Admin changelist order (-published_date, -pk).
+            models.Index(fields=['-published_date', '-id'], name='core_post_date_idx'),
+        ]
     
     def __str__(self):
         return self.title
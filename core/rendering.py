@@ -0,0 +1,145 @@
+"""
+Markdown rendering for blog posts.
+
+``markdown`` (and Pygments, which code highlighting pulls in) is imported on
+first use rather than at module load, so worker boot and management commands
+that never render a post don't pay for it.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.extra',
+    'core.highlighting',
+    'markdown.extensions.toc',
+]
+
+BLOCK_KEY = 'md-block:{}'
+
+FENCES = ('```', '~~~')
+
+LIST_ITEM = re.compile(r'(?:[*+-]|\d+\.)\s')
+
+HTML_OPEN = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)[\s/>]')
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr',
+}
+
+
+def _markdown():
+    import markdown
+
+    return markdown.Markdown(
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs={'core.highlighting': {'pygments_style': settings.PYGMENTS_STYLE}},
+    )
+
+
+def render_markdown(text):
+    """Convert ``text`` to HTML. Returns ``(html, toc)``."""
+    md = _markdown()
+    html = md.convert(text)
+    return html, getattr(md, 'toc', '')
+
+
+def _block_kind(line):
+    """The kind of block that ``line`` opens, if blank lines can't end it."""
+    if line.startswith('>'):
+        return 'blockquote'
+    if LIST_ITEM.match(line):
+        # Python-Markdown continues a list whichever marker the item uses.
+        return 'list'
+    return None
+
+
+def _tag_depth(line, tag):
+    opened = len(re.findall(rf'<{tag}[\s/>]', line, re.IGNORECASE))
+    return opened - len(re.findall(rf'</{tag}\s*>', line, re.IGNORECASE))
+
+
+def split_blocks(text):
+    """
+    Split Markdown into top-level blocks at blank lines. A block keeps going
+    where the full render would: fenced code and raw HTML elements run to
+    their closing line, indented lines after a blank line (list
+    continuations, code) stay with the block before them, and list items or
+    quote lines after a blank line join the list or quote above (a loose
+    list is still one ``<ul>``).
+    """
+    blocks = []
+    current = []
+    kind = None
+    fence = None
+    html = None
+    blank = False
+    for line in text.replace('\r\n', '\n').split('\n'):
+        stripped = line.strip()
+        if fence:
+            current.append(line)
+            if stripped.startswith(fence):
+                fence = None
+            continue
+        if html:
+            current.append(line)
+            depth = html[1] + _tag_depth(line, html[0])
+            html = (html[0], depth) if depth > 0 else None
+            continue
+        if not stripped:
+            blank = True
+            if current:
+                current.append(line)
+            continue
+        if blank and current and not line[:1].isspace() and not (kind and _block_kind(line) == kind):
+            blocks.append('\n'.join(current).strip('\n'))
+            current = []
+        blank = False
+        if not current:
+            kind = _block_kind(line)
+            match = HTML_OPEN.match(line)
+            if match and match[1].lower() not in VOID_ELEMENTS:
+                depth = _tag_depth(line, match[1])
+                html = (match[1], depth) if depth > 0 else None
+        current.append(line)
+        if stripped.startswith(FENCES):
+            fence = stripped[:3]
+    if current:
+        blocks.append('\n'.join(current).strip('\n'))
+    return blocks
+
+
+def block_id(block):
+    return hashlib.sha1(block.encode()).hexdigest()
+
+
+def render_blocks(text):
+    """
+    Render ``text`` block by block for live previews. Returns a list of
+    ``(block_id, html)``; only blocks not already in the cache are converted,
+    so an edit re-renders (and re-highlights) just the blocks it touched.
+
+    Reference-style links and footnotes defined in another block won't
+    resolve here; the published page renders the whole document at once.
+    """
+    blocks = [(block_id(block), block) for block in split_blocks(text)]
+    keys = {BLOCK_KEY.format(id): id for id, block in blocks}
+    rendered = {keys[key]: html for key, html in cache.get_many(keys).items()}
+    metrics.CACHE_REQUESTS.inc(len(rendered), cache='markdown_block', result='hit')
+    metrics.CACHE_REQUESTS.inc(len(keys) - len(rendered), cache='markdown_block', result='miss')
+
+    missing = {}
+    md = None
+    for id, block in blocks:
+        if id in rendered:
+            continue
+        if md is None:
+            md = _markdown()
+        rendered[id] = missing[BLOCK_KEY.format(id)] = md.reset().convert(block)
+    if missing:
+        cache.set_many(missing)
+    return [(id, rendered[id]) for id, block in blocks]
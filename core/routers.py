@@ -0,0 +1,79 @@
+"""
+Read-replica routing.
+
+Views that set ``use_read_replica = True`` read from one of
+``DATABASE_REPLICAS`` for the whole request (see
+``core.middleware.ReadReplicaMiddleware``); everything else, and every
+write, uses ``default``. Replicas are taken in turn, and one that doesn't
+answer a query (or fails one mid-request) is skipped for
+``REPLICA_RETRY_SECONDS``. With none available, reads fall back to
+``default``.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_replica = ContextVar('read_replica', default=None)
+
+_turn = itertools.count()
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+def choose_replica():
+    """The next healthy replica alias, or None if there is none."""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    start = next(_turn)
+    for i in range(len(replicas)):
+        alias = replicas[(start + i) % len(replicas)]
+        if _down_until.get(alias, 0) > time.monotonic():
+            continue
+        try:
+            # A real query: connecting alone can succeed against an empty or
+            # half-configured database.
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            mark_down(alias)
+            continue
+        return alias
+    return None
+
+
+def mark_down(alias):
+    """Skip the replica ``alias`` for ``REPLICA_RETRY_SECONDS``."""
+    with _down_lock:
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+    connections[alias].close()
+
+
+def route_reads_to(alias):
+    """Send reads in the current context to ``alias`` (``None`` for the primary)."""
+    _replica.set(alias)
+
+
+def current_replica():
+    """The replica reads in the current context go to, or None."""
+    return _replica.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary.
+        return False if db in settings.DATABASE_REPLICAS else None
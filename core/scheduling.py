@@ -0,0 +1,32 @@
+"""
+Scheduled publishing.
+
+A post with ``publish_at`` set and ``is_published`` unchecked is flipped live
+by ``publish_due_posts()`` (run by the ``publish_scheduled`` command), so the
+public querysets only ever need ``is_published=True`` and never compare
+against the current time.
+"""
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .cache import invalidate_model
+from .models import Post
+
+
+def publish_due_posts(now=None):
+    """Publish every scheduled post whose time has come. Returns how many went live."""
+    now = now or timezone.now()
+    published = Post.objects.filter(is_published=False, publish_at__lte=now).update(
+        is_published=True, published_date=F('publish_at'), publish_at=None,
+    )
+    if published:
+        # update() skips save signals, so invalidate the listings ourselves.
+        invalidate_model(Post)
+    return published
+
+
+def next_publish_at():
+    """Return when the next scheduled post goes live, or None."""
+    return Post.objects.filter(is_published=False, publish_at__isnull=False).aggregate(
+        next=Min('publish_at'),
+    )['next']
@@ -0,0 +1,58 @@
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_model
+from .storage import ContentAddressedMixin
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_content_cache(sender, **kwargs):
+    invalidate_model(sender)
+
+
+@receiver(m2m_changed)
+def invalidate_relation_cache(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_model(sender)
+
+
+def _counted_file_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedMixin)
+    ]
+
+
+def _release(field, name):
+    transaction.on_commit(lambda: field.storage.delete(name))
+
+
+@receiver(pre_save)
+def remember_replaced_files(sender, instance, raw=False, **kwargs):
+    fields = _counted_file_fields(sender)
+    if raw or not fields or instance._state.adding or instance.pk is None:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values(*(field.attname for field in fields)).first()
+    if old is None:
+        return
+    instance._replaced_files = [
+        (field, old[field.attname]) for field in fields
+        if old[field.attname] and old[field.attname] != getattr(instance, field.attname).name
+    ]
+
+
+@receiver(post_save)
+def release_replaced_files(sender, instance, **kwargs):
+    for field, name in getattr(instance, '_replaced_files', ()):
+        _release(field, name)
+    instance._replaced_files = []
+
+
+@receiver(post_delete)
+def release_deleted_files(sender, instance, **kwargs):
+    for field in _counted_file_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            _release(field, name)
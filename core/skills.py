@@ -0,0 +1,52 @@
+"""
+Skills grouped by category, shared by the home page's skill bars and the
+skills page. Built with one query and cached under the current ``skills``
+version, so editing a skill rebuilds it.
+"""
+from collections import namedtuple
+from itertools import groupby
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Window
+
+from . import metrics
+from .cache import get_versions
+from .models import SKILL_CATEGORIES, Skill
+
+SKILL_GROUPS_KEY = 'skill-groups:{}'
+
+SkillGroup = namedtuple('SkillGroup', ['category', 'label', 'count', 'average_level', 'skills'])
+
+
+def get_skill_groups():
+    """Return the ``SkillGroup`` list, in category order."""
+    key = SKILL_GROUPS_KEY.format(get_versions(['skills'])['skills'])
+    groups = cache.get(key)
+    metrics.CACHE_REQUESTS.inc(cache='skill_groups', result='miss' if groups is None else 'hit')
+    if groups is None:
+        groups = build_skill_groups()
+        cache.set(key, groups, settings.FRAGMENT_CACHE_TIMEOUT)
+    return groups
+
+
+def build_skill_groups():
+    # Per-category count and average come from window functions over the
+    # same rows, already sorted by category rank and then order.
+    skills = Skill.objects.annotate(
+        category_count=Window(Count('pk'), partition_by=F('category')),
+        category_average=Window(Avg('level'), partition_by=F('category')),
+    )
+    labels = dict(SKILL_CATEGORIES)
+    groups = []
+    for category, members in groupby(skills, key=attrgetter('category')):
+        members = list(members)
+        groups.append(SkillGroup(
+            category=category,
+            label=labels.get(category, category),
+            count=members[0].category_count,
+            average_level=round(members[0].category_average),
+            skills=members,
+        ))
+    return groups
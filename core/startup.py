@@ -0,0 +1,52 @@
+"""
+Cold-start measurement for the WSGI/ASGI entry points.
+
+Each measurement runs in a fresh interpreter with ``python -X importtime`` so
+nothing already imported by the caller skews the result.
+"""
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+# Worker boot plus loading the URLconf, which is what the first request pays for.
+ENTRY_POINTS = {
+    'wsgi': 'import portfolio_site.wsgi; from django.urls import get_resolver; get_resolver().url_patterns',
+    'asgi': 'import portfolio_site.asgi; from django.urls import get_resolver; get_resolver().url_patterns',
+}
+
+# Modules that must only be imported when a post is actually rendered.
+DEFERRED_MODULES = ['markdown', 'pygments']
+
+DEFAULT_BUDGET_MS = 1500
+
+ImportTiming = namedtuple('ImportTiming', ['module', 'self_us', 'cumulative_us', 'depth'])
+StartupProfile = namedtuple('StartupProfile', ['total_ms', 'imports'])
+
+
+def profile_startup(entry_point='wsgi'):
+    """Boot ``entry_point`` in a subprocess and return its ``StartupProfile``."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', ENTRY_POINTS[entry_point]],
+        cwd=settings.BASE_DIR, capture_output=True, text=True,
+    )
+    total_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f'{entry_point} failed to start:\n{result.stderr}')
+    return StartupProfile(total_ms, parse_importtime(result.stderr))
+
+
+def parse_importtime(output):
+    """Parse ``-X importtime`` output into a list of ``ImportTiming``."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append(ImportTiming(module, int(self_us), int(cumulative_us), depth))
+    return timings
@@ -0,0 +1,77 @@
+// Live Markdown preview for the post admin.
+// Edits are debounced, and the server only returns HTML for blocks this page
+// hasn't seen yet, so unchanged blocks are neither re-rendered nor re-sent.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const DEBOUNCE_MS = 400;
+
+    const textarea = document.getElementById('id_markdown_content');
+    if (!textarea || !textarea.dataset.previewUrl) {
+        return;
+    }
+
+    const panel = document.createElement('div');
+    panel.className = 'post-preview';
+    textarea.insertAdjacentElement('afterend', panel);
+
+    const csrfToken = document.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    let htmlById = {};
+    let timer = null;
+    let latestRequest = 0;
+
+    function apply(blocks) {
+        const children = Array.from(panel.children);
+        blocks.forEach((block, i) => {
+            if (block.html !== undefined) {
+                htmlById[block.id] = block.html;
+            }
+            const existing = children[i];
+            if (existing && existing.dataset.block === block.id) {
+                return;
+            }
+            const element = document.createElement('div');
+            element.dataset.block = block.id;
+            element.innerHTML = htmlById[block.id] || '';
+            if (existing) {
+                panel.replaceChild(element, existing);
+            } else {
+                panel.appendChild(element);
+            }
+        });
+        children.slice(blocks.length).forEach(child => panel.removeChild(child));
+
+        // Forget blocks that are no longer in the document.
+        const current = {};
+        blocks.forEach(block => { current[block.id] = htmlById[block.id]; });
+        htmlById = current;
+    }
+
+    function render() {
+        const requestId = ++latestRequest;
+        const body = new FormData();
+        body.append('markdown', textarea.value);
+        Object.keys(htmlById).forEach(id => body.append('known', id));
+
+        fetch(textarea.dataset.previewUrl, {
+            method: 'POST',
+            body: body,
+            headers: { 'X-CSRFToken': csrfToken },
+            credentials: 'same-origin'
+        })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(data => {
+                // Ignore responses that arrive after a newer request was sent.
+                if (requestId === latestRequest) {
+                    apply(data.blocks);
+                }
+            })
+            .catch(() => {});
+    }
+
+    textarea.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(render, DEBOUNCE_MS);
+    });
+
+    render();
+});
@@ -0,0 +1,128 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored under the SHA-256 of their contents instead of their
+filename, so uploading the same file twice reuses the stored copy and a
+stored name never changes meaning. That makes every media URL safe to serve
+with far-future, immutable caching.
+
+Each stored file has a ``MediaBlob`` row counting the fields that point at
+it; the file is only removed when the last reference is released (see
+``core.signals``).
+"""
+import hashlib
+import os
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.utils import validate_file_name
+from django.db import transaction
+from django.db.models import F
+
+from .models import MediaBlob
+
+try:
+    from storages.backends.s3 import S3Storage
+except (ImportError, ImproperlyConfigured):  # django-storages[s3] is only needed for MEDIA_STORAGE=s3
+    S3Storage = None
+
+CAS_PREFIX = 'cas/'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,10}$')
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+def content_name(name, content):
+    """Return the content-addressed name for ``content``, keeping the extension of ``name``."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest_name(name, digest.hexdigest())
+
+
+def digest_name(name, digest):
+    """Return the content-addressed name for a file named ``name`` whose SHA-256 is ``digest``."""
+    extension = os.path.splitext(name)[1].lower()
+    if not _EXTENSION_RE.match(extension):
+        extension = ''
+    return f'{CAS_PREFIX}{digest[:2]}/{digest}{extension}'
+
+
+class AlreadyStored(FileExistsError):
+    """Another process stored the same content first."""
+
+
+class ContentAddressedMixin:
+    """Store files by content hash with reference counting. Mix in before a ``Storage`` class."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content)
+        validate_file_name(name, allow_relative_path=True)
+
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'size': content.size},
+            )
+            if created or not self.exists(name):
+                try:
+                    self._save(name, content)
+                except AlreadyStored:
+                    pass
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # save() never calls this, so we only get here from a backend's retry
+        # loop after losing a race to store identical content.
+        if is_content_addressed(name):
+            raise AlreadyStored(name)
+        return super().get_available_name(name, max_length=max_length)
+
+    def delete(self, name):
+        """
+        Release one reference to ``name``, removing the file with the last one.
+        Files without a ``MediaBlob``, including everything uploaded before
+        content addressing, are never removed: other rows may still use them.
+        """
+        if not is_content_addressed(name):
+            return
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            if blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    """Content-addressed storage under ``MEDIA_ROOT``."""
+
+
+class ContentAddressedS3Storage(ContentAddressedMixin, S3Storage or Storage):
+    """
+    Content-addressed storage in an S3-compatible bucket. Point
+    ``endpoint_url`` at a local stand-in such as MinIO for development.
+    """
+
+    def __init__(self, **settings):
+        if S3Storage is None:
+            raise ImproperlyConfigured('MEDIA_STORAGE=s3 requires django-storages[s3].')
+        settings.setdefault('object_parameters', {'CacheControl': IMMUTABLE_CACHE_CONTROL})
+        super().__init__(**settings)
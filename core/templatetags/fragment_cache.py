@@ -0,0 +1,47 @@
+"""
+Django's ``{% cache %}`` tag, counting hits and misses in
+``CACHE_REQUESTS`` under ``cache="template_fragment"``.
+
+Load it in place of ``cache``::
+
+    {% load fragment_cache %}
+    {% cache fragment_cache_timeout skills cache_versions.skills %}...{% endcache %}
+"""
+from django import template
+from django.template import NodeList
+from django.templatetags import cache as cache_tags
+
+from core import metrics
+
+register = template.Library()
+
+
+class MissRecordingNodeList(NodeList):
+    """The fragment body; ``CacheNode`` only renders it on a cache miss."""
+    def __init__(self, nodelist, node):
+        super().__init__(nodelist)
+        self.contains_nontext = nodelist.contains_nontext
+        self.node = node
+
+    def render(self, context):
+        context.render_context[self.node] = 'miss'
+        return super().render(context)
+
+
+class CountedCacheNode(cache_tags.CacheNode):
+    def __init__(self, nodelist, *args):
+        super().__init__(MissRecordingNodeList(nodelist, self), *args)
+
+    def render(self, context):
+        # render_context is per template render, so concurrent renders of the
+        # same compiled node don't see each other's result.
+        context.render_context[self] = 'hit'
+        html = super().render(context)
+        metrics.CACHE_REQUESTS.inc(cache='template_fragment', result=context.render_context[self])
+        return html
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    node = cache_tags.do_cache(parser, token)
+    return CountedCacheNode(node.nodelist, node.expire_time_var, node.fragment_name, node.vary_on, node.cache_name)
@@ -0,0 +1,29 @@
+"""
+Test runner that keeps the suite away from the site's cache.
+
+The default cache is a file cache shared with the running site, and tests
+clear it and fill it with fixture pages. Every run gets a throwaway file
+cache of its own instead.
+"""
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='portfolio-test-cache-')
+        self.cache_override = override_settings(CACHES={
+            'default': {'BACKEND': TEST_CACHE_BACKEND, 'LOCATION': self.cache_dir, 'OPTIONS': {'MAX_ENTRIES': 5000}},
+        })
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
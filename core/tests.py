@@ -1,3 +1,1235 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import markdown
+from markdown.extensions.codehilite import CodeHilite
+
+from . import metrics, routers
+from .admin import ProjectAdmin
+from .bundles import NATURAL_KEYS, BundleError, export_bundle, import_bundle
+from .cache import MODEL_NAMESPACES, get_versions, invalidate
+from .highlighting import _highlight
+from .media import RangeNotSatisfiable, parse_range
+from .middleware import CompressionMiddleware
+from .minify import minify_html
+from .models import (
+    About, Certification, Education, Extracurricular, MediaBlob, Post, Project, ProjectImage, SiteSettings, Skill,
+    Tag,
+)
+from .rendering import block_id, render_blocks, render_markdown, split_blocks
+from .scheduling import publish_due_posts
+from .skills import get_skill_groups
+from .startup import DEFAULT_BUDGET_MS, DEFERRED_MODULES, profile_startup
+
+# Ceiling for rendering any public page from cold caches. Generous, so it
+# only trips on real regressions (a query per row, re-highlighting, ...).
+RENDER_BUDGET_MS = 300
+
+POST_BODY = """Field notes from the test bench.
+
+```python
+def flow_rate(area, velocity):
+    return area * velocity
+```
+
+| Pump | Flow |
+| ---- | ---- |
+| A    | 12   |
+"""
+
+
+class StartupTimeTests(SimpleTestCase):
+    def test_wsgi_cold_start_within_budget(self):
+        profile = profile_startup('wsgi')
+        self.assertLess(profile.total_ms, DEFAULT_BUDGET_MS)
+
+    def test_asgi_cold_start_within_budget(self):
+        profile = profile_startup('asgi')
+        self.assertLess(profile.total_ms, DEFAULT_BUDGET_MS)
+
+    def test_renderer_imports_are_deferred(self):
+        imported = {timing.module.split('.')[0] for timing in profile_startup('wsgi').imports}
+        for module in DEFERRED_MODULES:
+            self.assertNotIn(module, imported)
+
+    def test_profile_command_lists_modules_below_the_entry_point(self):
+        out = io.StringIO()
+        call_command('startup_profile', '--top', '5', stdout=out)
+        report = out.getvalue()
+        self.assertIn('    django.core.wsgi', report)
+        self.assertIn('Slowest modules by self time:', report)
+        self_rows = report.split('Slowest modules by self time:')[1].splitlines()[2:7]
+        self.assertEqual(len([row for row in self_rows if ' ms ' in row]), 5)
+
+
+class WarmCacheTests(TestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_process_local_cache_without_base_url(self):
+        with self.assertRaisesMessage(CommandError, '--base-url'):
+            call_command('warm_cache', stdout=io.StringIO())
+
+
+def seed_portfolio():
+    """Representative content: several rows per model, with images and tags."""
+    SiteSettings.objects.create(site_name='Test Portfolio')
+    About.objects.create(content='About the engineer.')
+    for i, category in enumerate(['ENG', 'ENG', 'DESIGN', 'PROG', 'PROG', 'SOFT']):
+        Skill.objects.create(name=f'Skill {i}', level=50 + i * 5, category=category, order=i)
+    for i in range(5):
+        project = Project.objects.create(
+            title=f'Project {i}', short_description=f'Summary {i}', long_description='Details.',
+            technologies='CAD, MATLAB, C++, Arduino', featured=i < 3, order=i,
+        )
+        for j in range(2):
+            ProjectImage.objects.create(project=project, image=f'projects/{i}-{j}.jpg', caption=f'Image {i}-{j}')
+    for i in range(2):
+        Education.objects.create(degree=f'Degree {i}', institution=f'University {i}', period='2020-2024', order=i)
+        Certification.objects.create(title=f'Certificate {i}', issuer=f'Issuer {i}', issue_date=datetime.date(2023, 1, 1))
+        Extracurricular.objects.create(title=f'Club {i}', organization=f'Society {i}', role='Member', period='2022', order=i)
+    tags = [Tag.objects.create(name=f'Tag {i}') for i in range(3)]
+    for i in range(8):
+        post = Post.objects.create(
+            title=f'Post {i}', markdown_content=POST_BODY, is_published=True, is_featured=i < 2,
+            published_date=timezone.now() - datetime.timedelta(days=i),
+        )
+        post.tags.set(tags[:i % 3 + 1])
+    Post.objects.create(title='Draft', markdown_content=POST_BODY)
+
+
+class ViewQueryBudgetTests(TestCase):
+    """
+    Exact query counts per public view, from cold caches and warm ones. A
+    template change that adds a query per row changes these numbers.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        seed_portfolio()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertQueryBudget(self, url, cold, warm):
+        with self.assertNumQueries(cold):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(warm):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assertQueryBudget(reverse('home'), cold=10, warm=2)
+
+    def test_blog_list(self):
+        self.assertQueryBudget(reverse('blog_list'), cold=5, warm=0)
+
+    def test_unused_query_params_share_cached_page(self):
+        url = reverse('blog_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url, {'utm_source': 'feed'})
+            self.client.get(url, {'utm_source': 'mail', 'ref': 'x'})
+        self.assertContains(self.client.get(url, {'page': 2, 'utm_source': 'feed'}), 'Post 7')
+
+    def test_post_detail(self):
+        self.assertQueryBudget(reverse('post_detail', args=['post-0']), cold=3, warm=0)
+
+    def test_project_list(self):
+        self.assertQueryBudget(reverse('project_list'), cold=3, warm=0)
+
+    def test_project_detail(self):
+        self.assertQueryBudget(reverse('project_detail', args=['project-0']), cold=3, warm=0)
+
+    def test_skill_list(self):
+        self.assertQueryBudget(reverse('skill_list'), cold=2, warm=0)
+
+    def test_queries_do_not_grow_with_content(self):
+        for url, cold in [(reverse('home'), 10), (reverse('blog_list'), 5), (reverse('project_list'), 3)]:
+            project = Project.objects.create(title=f'Extra for {url}', short_description='x', technologies='CAD', featured=True)
+            ProjectImage.objects.create(project=project, image='projects/extra.jpg')
+            Post.objects.create(title=f'Extra for {url}', markdown_content='x', is_published=True).tags.set(Tag.objects.all())
+            cache.clear()
+            with self.subTest(url=url), self.assertNumQueries(cold):
+                self.client.get(url)
+
+
+class RenderTimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_portfolio()
+
+    def test_pages_render_within_budget(self):
+        urls = [
+            reverse('home'), reverse('blog_list'), reverse('post_detail', args=['post-0']),
+            reverse('project_list'), reverse('project_detail', args=['project-0']), reverse('skill_list'),
+        ]
+        for url in urls:
+            # The first request pays for imports and template compilation.
+            self.client.get(url)
+            cache.clear()
+            with self.subTest(url=url):
+                start = time.perf_counter()
+                response = self.client.get(url)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.assertEqual(response.status_code, 200)
+                self.assertLess(elapsed_ms, RENDER_BUDGET_MS)
+
+
+class SkillGroupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_portfolio()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_follow_category_order_with_stats(self):
+        Skill.objects.create(name='Welding', level=90, category='ENG', order=0)
+        groups = get_skill_groups()
+        self.assertEqual([group.category for group in groups], ['ENG', 'PROG', 'DESIGN', 'SOFT'])
+        engineering = groups[0]
+        self.assertEqual(engineering.label, 'Engineering')
+        self.assertEqual(engineering.count, 3)
+        self.assertEqual(engineering.average_level, 65)  # (50 + 55 + 90) / 3
+        self.assertEqual([skill.name for skill in engineering.skills], ['Skill 0', 'Welding', 'Skill 1'])
+
+    def test_home_and_skill_page_share_one_query(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(1):  # site settings only
+            self.client.get(reverse('skill_list'))
+
+    def test_rebuilt_after_skill_edit(self):
+        get_skill_groups()
+        Skill.objects.filter(category='SOFT').delete()
+        self.assertNotIn('SOFT', [group.category for group in get_skill_groups()])
+
+
+# Schedules a post in its own database file and runs publish_scheduled, like
+# a cron job would. Only the cache is shared with the test process.
+PUBLISH_IN_SUBPROCESS = """
+import datetime, sys
+import django
+from portfolio_site import settings
+settings.DATABASES['default']['NAME'] = sys.argv[1]
+django.setup()
+from django.core.management import call_command
+from django.utils import timezone
+
+import markdown
+from markdown.extensions.codehilite import CodeHilite
+from core.models import Post
+call_command('migrate', verbosity=0)
+Post.objects.create(title='Cron', markdown_content='x', publish_at=timezone.now() - datetime.timedelta(minutes=1))
+call_command('publish_scheduled')
+"""
+
+
+class CacheInvalidationTests(TestCase):
+    """Every content edit must show up on the next request, cached or not."""
+    @classmethod
+    def setUpTestData(cls):
+        seed_portfolio()
+
+    def setUp(self):
+        cache.clear()
+
+    def assertChangeShown(self, url, change, text):
+        self.assertNotContains(self.client.get(url), text)
+        self.client.get(url)  # served from cache
+        change()
+        self.assertContains(self.client.get(url), text)
+
+    def test_every_content_model_bumps_its_namespaces(self):
+        for label, namespaces in MODEL_NAMESPACES.items():
+            model = apps.get_model(label)
+            if model._meta.auto_created:
+                continue
+            with self.subTest(model=label):
+                before = get_versions(namespaces)
+                model.objects.first().save()
+                after = get_versions(namespaces)
+                for namespace in namespaces:
+                    self.assertNotEqual(before[namespace], after[namespace])
+
+    def test_site_settings(self):
+        def change():
+            SiteSettings.objects.update_or_create(pk=SiteSettings.objects.get().pk, defaults={'site_name': 'Renamed Site'})
+        for url in (reverse('home'), reverse('blog_list')):
+            cache.clear()
+            SiteSettings.objects.update(site_name='Test Portfolio')
+            with self.subTest(url=url):
+                self.assertChangeShown(url, change, 'Renamed Site')
+
+    def test_skill(self):
+        def change():
+            skill = Skill.objects.first()
+            skill.name = 'Hydraulic Design'
+            skill.save()
+        self.assertChangeShown(reverse('home'), change, 'Hydraulic Design')
+        cache.clear()
+        self.assertContains(self.client.get(reverse('skill_list')), 'Hydraulic Design')
+
+    def test_skill_delete(self):
+        self.client.get(reverse('skill_list'))
+        Skill.objects.get(name='Skill 0').delete()
+        self.assertNotContains(self.client.get(reverse('skill_list')), 'Skill 0<')
+
+    def test_project(self):
+        def change():
+            project = Project.objects.get(slug='project-0')
+            project.title = 'Retractable Washing Line'
+            project.save()
+        for url in (reverse('home'), reverse('project_list'), reverse('project_detail', args=['project-0'])):
+            with self.subTest(url=url):
+                Project.objects.filter(slug='project-0').update(title='Project 0')
+                cache.clear()
+                self.assertChangeShown(url, change, 'Retractable Washing Line')
+
+    def test_project_image(self):
+        url = reverse('project_detail', args=['project-1'])
+        self.assertChangeShown(
+            url, lambda: ProjectImage.objects.create(project=Project.objects.get(slug='project-1'), image='projects/new.jpg', caption='Assembly jig'),
+            'Assembly jig',
+        )
+
+    def test_education(self):
+        def change():
+            education = Education.objects.first()
+            education.degree = 'MSc Fluid Power'
+            education.save()
+        self.assertChangeShown(reverse('home'), change, 'MSc Fluid Power')
+
+    def test_certification(self):
+        self.assertChangeShown(
+            reverse('home'), lambda: Certification.objects.create(title='Certified SolidWorks Associate', issuer='Dassault'),
+            'Certified SolidWorks Associate',
+        )
+
+    def test_extracurricular(self):
+        self.assertChangeShown(
+            reverse('home'),
+            lambda: Extracurricular.objects.create(title='Robotics', organization='Robotics League', period='2024'),
+            'Robotics League',
+        )
+
+    def test_post(self):
+        def change():
+            post = Post.objects.get(slug='post-0')
+            post.title = 'Hydraulic Press Teardown'
+            post.save()
+        for url in (reverse('home'), reverse('blog_list'), reverse('post_detail', args=['post-0'])):
+            with self.subTest(url=url):
+                Post.objects.filter(slug='post-0').update(title='Post 0')
+                cache.clear()
+                self.assertChangeShown(url, change, 'Hydraulic Press Teardown')
+
+    def test_post_unpublished(self):
+        url = reverse('blog_list')
+        self.assertContains(self.client.get(url), 'Post 1')
+        post = Post.objects.get(slug='post-1')
+        post.is_published = False
+        post.save()
+        self.assertNotContains(self.client.get(url), 'Post 1<')
+        self.assertEqual(self.client.get(reverse('post_detail', args=['post-1'])).status_code, 404)
+
+    def test_tag_rename_and_relation(self):
+        url = reverse('blog_list')
+        def rename():
+            tag = Tag.objects.get(slug='tag-2')
+            tag.name = 'Automation'
+            tag.save()
+        self.assertChangeShown(url, rename, 'Automation')
+        self.assertChangeShown(
+            url, lambda: Post.objects.get(slug='post-0').tags.add(Tag.objects.create(name='Pneumatics')), 'Pneumatics',
+        )
+
+    def test_scheduled_publish(self):
+        Post.objects.create(
+            title='Scheduled Teardown', markdown_content='x', publish_at=timezone.now() - datetime.timedelta(minutes=1),
+        )
+        self.assertChangeShown(reverse('blog_list'), publish_due_posts, 'Scheduled Teardown')
+
+    def test_scheduled_publish_from_another_process(self):
+        url = reverse('blog_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        before = get_versions(['posts'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = subprocess.run(
+                [sys.executable, '-c', PUBLISH_IN_SUBPROCESS, os.path.join(directory, 'db.sqlite3')],
+                cwd=settings.BASE_DIR, env={
+                    **os.environ, 'DJANGO_SETTINGS_MODULE': 'portfolio_site.settings',
+                    'CACHE_BACKEND': settings.CACHES['default']['BACKEND'],
+                    'CACHE_LOCATION': settings.CACHES['default']['LOCATION'],
+                },
+                capture_output=True, text=True,
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('Published 1 scheduled post', result.stdout)
+
+        self.assertNotEqual(get_versions(['posts']), before)
+        with self.assertNumQueries(5):  # rendered again, not served from cache
+            self.client.get(url)
+
+    def test_admin_change_form(self):
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        project = Project.objects.get(slug='project-2')
+        url = reverse('project_detail', args=['project-2'])
+        self.client.get(url)
+
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:core_project_change', args=[project.pk]), {
+            'title': 'Hydropower Harness', 'slug': 'project-2', 'short_description': project.short_description,
+            'long_description': project.long_description, 'technologies': project.technologies,
+            'order': project.order, 'featured': 'on',
+            'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0, 'images-MIN_NUM_FORMS': 0, 'images-MAX_NUM_FORMS': 1000,
+        })
+        self.assertEqual(response.status_code, 302, getattr(response, 'context', None) and response.context.get('errors'))
+        self.client.logout()
+        self.assertContains(self.client.get(url), 'Hydropower Harness')
+
+    def test_admin_list_editable(self):
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        url = reverse('blog_list')
+        self.assertContains(self.client.get(url), 'Post 0')
+
+        posts = list(Post.objects.order_by('-published_date', '-pk'))
+        data = {
+            '_save': 'Save', 'action': '',
+            'form-TOTAL_FORMS': len(posts), 'form-INITIAL_FORMS': len(posts),
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+        }
+        for i, post in enumerate(posts):
+            data[f'form-{i}-id'] = post.pk
+            if post.is_published and post.slug != 'post-0':
+                data[f'form-{i}-is_published'] = 'on'
+            if post.is_featured:
+                data[f'form-{i}-is_featured'] = 'on'
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:core_post_changelist'), data)
+        self.assertEqual(response.status_code, 302)
+        self.client.logout()
+
+        self.assertFalse(Post.objects.get(slug='post-0').is_published)
+        self.assertNotContains(self.client.get(url), 'Post 0<')
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_portfolio()
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def list_editable_data(self, posts, featured=()):
+        data = {
+            '_save': 'Save', 'action': '',
+            'form-TOTAL_FORMS': len(posts), 'form-INITIAL_FORMS': len(posts),
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+        }
+        for i, post in enumerate(posts):
+            data[f'form-{i}-id'] = post.pk
+            if post.is_published:
+                data[f'form-{i}-is_published'] = 'on'
+            if post.is_featured or post in featured:
+                data[f'form-{i}-is_featured'] = 'on'
+        return data
+
+    def test_large_columns_deferred_only_on_changelist(self):
+        response = self.client.get(reverse('admin:core_post_changelist'))
+        self.assertEqual(
+            {frozenset(post.get_deferred_fields()) for post in response.context['cl'].result_list},
+            {frozenset({'markdown_content', 'excerpt'})},
+        )
+        post = Post.objects.get(slug='post-0')
+        response = self.client.get(reverse('admin:core_post_change', args=[post.pk]))
+        self.assertEqual(response.context['original'].get_deferred_fields(), set())
+        self.assertContains(response, 'def flow_rate')
+
+    def test_list_editable_writes_in_batches(self):
+        posts = list(Post.objects.order_by('-published_date', '-pk'))
+        unfeatured = [post for post in posts if not post.is_featured]
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.post(
+                reverse('admin:core_post_changelist'), self.list_editable_data(posts, featured=unfeatured),
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.filter(is_featured=False).count(), 0)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "core_post"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "django_admin_log"')]), 1)
+        self.assertEqual(
+            sorted(LogEntry.objects.values_list('object_id', flat=True)), sorted(str(post.pk) for post in unfeatured),
+        )
+
+    def test_rejects_rows_outside_the_edited_queryset(self):
+        posts = list(Post.objects.filter(is_featured=False)[:2])
+        data = self.list_editable_data(posts, featured=posts)
+        data['form-1-id'] = Post.objects.latest('pk').pk + 1
+
+        response = self.client.post(reverse('admin:core_post_changelist'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].formset.errors[1]['id'], [
+            'Select a valid choice. That choice is not one of the available choices.',
+        ])
+        self.assertFalse(Post.objects.get(pk=posts[0].pk).is_featured)
+        self.assertFalse(LogEntry.objects.exists())
+
+    def test_sorts_projects_by_technology_count(self):
+        Project.objects.create(title='Sparse', short_description='x', technologies='CAD')
+        Project.objects.create(title='Dense', short_description='x', technologies='CAD, MATLAB, C++, Arduino, Python, Rust')
+        url = reverse('admin:core_project_changelist')
+        position = ProjectAdmin.list_display.index('technology_count') + 1
+        response = self.client.get(url, {'o': f'-{position}'})
+        projects = list(response.context['cl'].result_list)
+        self.assertEqual([project._technology_count for project in projects], [6, 4, 4, 4, 4, 4, 1])
+        self.assertEqual(projects[0].title, 'Dense')
+        self.assertContains(response, '<td class="field-technology_count">6</td>', html=True)
+
+
+class MediaTestMixin:
+    """Store uploads in a throwaway MEDIA_ROOT."""
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ContentAddressedStorageTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(title='Press', short_description='x', technologies='CAD')
+
+    def add_image(self, data, name='photo.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProjectImage.objects.create(project=self.project, image=SimpleUploadedFile(name, data))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.add_image(b'same bytes', 'front.jpg')
+        second = self.add_image(b'same bytes', 'back.JPG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('cas/'))
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refcount, 2)
+
+    def test_file_removed_with_last_reference(self):
+        first = self.add_image(b'same bytes')
+        second = self.add_image(b'same bytes')
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_replaced_file_released(self):
+        image = self.add_image(b'old bytes')
+        old_name = image.image.name
+        image.image = SimpleUploadedFile('photo.jpg', b'new bytes')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertNotEqual(image.image.name, old_name)
+        self.assertTrue(default_storage.exists(image.image.name))
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_resaving_unchanged_row_keeps_reference(self):
+        image = self.add_image(b'bytes')
+        image.caption = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertEqual(MediaBlob.objects.get(name=image.image.name).refcount, 1)
+        self.assertTrue(default_storage.exists(image.image.name))
+
+    def test_legacy_files_are_never_deleted(self):
+        # Uploaded before content addressing, shared by two rows, no MediaBlob.
+        name = 'projects/shared.jpg'
+        os.makedirs(os.path.dirname(default_storage.path(name)))
+        with open(default_storage.path(name), 'wb') as f:
+            f.write(b'legacy')
+        images = [ProjectImage.objects.create(project=self.project, image=name) for _ in range(2)]
+        for image in images:
+            with self.captureOnCommitCallbacks(execute=True):
+                image.delete()
+            self.assertTrue(default_storage.exists(name))
+
+    def test_legacy_file_kept_when_replaced(self):
+        name = 'projects/legacy.jpg'
+        os.makedirs(os.path.dirname(default_storage.path(name)))
+        with open(default_storage.path(name), 'wb') as f:
+            f.write(b'legacy')
+        image = ProjectImage.objects.create(project=self.project, image=name)
+        image.image = SimpleUploadedFile('photo.jpg', b'new bytes')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        self.assertTrue(default_storage.exists(name))
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        for header, expected in [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=900-', (900, 999)),
+            ('bytes=990-5000', (990, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=-5000', (0, 999)),
+            # Whole file: no header, other units, multiple ranges, nonsense.
+            (None, None),
+            ('items=0-99', None),
+            ('bytes=0-9,20-29', None),
+            ('bytes=50-10', None),
+            ('bytes=a-b', None),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 1000), expected)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=5000-6000', 'bytes=-0'):
+            with self.subTest(header=header), self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+
+class MediaServingTests(MediaTestMixin, TestCase):
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.name = 'cas/ab/abcdef.bin'
+        os.makedirs(os.path.dirname(default_storage.path(self.name)))
+        with open(default_storage.path(self.name), 'wb') as f:
+            f.write(self.DATA)
+        self.url = default_storage.url(self.name)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), self.DATA[10:20])
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.DATA[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2048-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        # A stale validator means the client's partial copy is out of date.
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+
+    def test_not_modified(self):
+        first = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_legacy_names_revalidate(self):
+        name = 'projects/photo.bin'
+        os.makedirs(os.path.dirname(default_storage.path(name)))
+        with open(default_storage.path(name), 'wb') as f:
+            f.write(self.DATA)
+        self.assertEqual(self.client.get(default_storage.url(name))['Cache-Control'], 'no-cache')
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.get(default_storage.url('cas/ab/missing.bin')).status_code, 404)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('ETag', response)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response.content, b'')
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.counter = metrics.Counter('test_events_total', 'Events.', ('kind',))
+        self.histogram = metrics.Histogram('test_duration_seconds', 'Durations.', buckets=(0.01, 0.1, 1))
+        for name in ('test_events_total', 'test_duration_seconds'):
+            self.addCleanup(metrics.REGISTRY.pop, name)
+        self.reset_store()
+
+    def reset_store(self):
+        # The next get_store() call picks up the current METRICS_DIR.
+        metrics._store_pid = None
+        self.addCleanup(setattr, metrics, '_store_pid', None)
+
+    def use_metrics_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        override = override_settings(METRICS_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.reset_store()
+        return directory
+
+    def write_from_processes(self, target, processes=4):
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=target) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+    def test_counters_summed_across_processes(self):
+        directory = self.use_metrics_dir()
+
+        def work():
+            for _ in range(500):
+                self.counter.inc(kind='a')
+                self.histogram.observe(0.05)
+
+        self.write_from_processes(work)
+        self.counter.inc(kind='a')
+        self.assertEqual(len(os.listdir(directory)), 5)
+        values = metrics.collect()
+        self.assertEqual(values[self.counter._key('', {'kind': 'a'})], 2001)
+        self.assertEqual(values[self.histogram._key('_count', {})], 2000)
+
+    def test_store_grows_past_initial_size(self):
+        self.use_metrics_dir()
+
+        def work():
+            # Enough distinct keys to outgrow the initial file several times.
+            for i in range(3000):
+                self.counter.inc(kind=f'kind-{i}')
+
+        self.write_from_processes(work, processes=2)
+        values = metrics.collect()
+        self.assertEqual(len(values), 3000)
+        self.assertEqual(set(values.values()), {2})
+
+    def test_histogram_exposition_is_cumulative(self):
+        for value in (0.005, 0.05, 0.05, 0.5, 5):
+            self.histogram.observe(value)
+        lines = metrics.exposition().splitlines()
+        start = lines.index('# TYPE test_duration_seconds histogram')
+        self.assertEqual(lines[start + 1:start + 7], [
+            'test_duration_seconds_bucket{le="0.01"} 1.0',
+            'test_duration_seconds_bucket{le="0.1"} 3.0',
+            'test_duration_seconds_bucket{le="1.0"} 4.0',
+            'test_duration_seconds_bucket{le="+Inf"} 5.0',
+            'test_duration_seconds_count 5.0',
+            'test_duration_seconds_sum 5.605',
+        ])
+
+    def test_counter_exposition_escapes_labels(self):
+        self.counter.inc(3, kind='say "hi"')
+        self.assertIn('test_events_total{kind="say \\"hi\\""} 3.0', metrics.exposition())
+
+    def test_counts_template_fragment_cache(self):
+        cache.clear()
+        template = Template('{% load fragment_cache %}{% cache 60 greeting name %}Hello {{ name }}{% endcache %}')
+        self.assertEqual(
+            [template.render(Context({'name': name})) for name in ('Ada', 'Ada', 'Grace')],
+            ['Hello Ada', 'Hello Ada', 'Hello Grace'],
+        )
+        values = metrics.collect()
+        for result, count in (('hit', 1), ('miss', 2)):
+            key = metrics.CACHE_REQUESTS._key('', {'cache': 'template_fragment', 'result': result})
+            self.assertEqual(values[key], count)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_endpoint_hidden_when_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_endpoint_without_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertContains(response, '# TYPE portfolio_http_requests_total counter')
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+    def test_endpoint_requires_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Basic s3cret').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+
+class MinifyHtmlTests(SimpleTestCase):
+    def test_collapses_line_breaks_and_indentation(self):
+        html = '<ul>\n    <li>One</li>\n\n\n    <li>Two  words</li>\n</ul>\n'
+        self.assertEqual(minify_html(html), '<ul>\n<li>One</li>\n<li>Two  words</li>\n</ul>')
+
+    def test_preserves_whitespace_sensitive_elements(self):
+        for element in (
+            '<pre class="codehilite">def f():\n    return 1\n\n</pre>',
+            '<textarea name="message">\n  line one\n\n  line two</textarea>',
+            '<script>\n  if (a) {\n      b();\n  }\n</script>',
+            '<STYLE>\n  .a {\n    color: red;\n  }\n</STYLE>',
+        ):
+            with self.subTest(element=element):
+                html = f'<div>\n    {element}\n    <p>after</p>\n</div>'
+                self.assertEqual(minify_html(html), f'<div>\n{element}\n<p>after</p>\n</div>')
+
+
+class MarkdownBlockTests(TestCase):
+    DOCUMENTS = [
+        POST_BODY,
+        '# Title\n\nIntro\n\n- one\n\n    continued\n\n- two\n\n1. three\n\nOutro',
+        '<div class="note">\n\nInside\n\n<div>\n\nNested\n\n</div>\n\n</div>\n\n<hr>\n\nAfter',
+        '> quoted\n\n> still quoted\n\n~~~\nfenced\n\n~~~\n\nDone',
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_blocks_render_like_the_whole_document(self):
+        def normalize(html):
+            return re.sub(r'>\s+<', '><', html)
+
+        for text in self.DOCUMENTS:
+            with self.subTest(text=text):
+                blocks = '\n'.join(html for block_id, html in render_blocks(text))
+                self.assertEqual(normalize(blocks), normalize(render_markdown(text)[0]))
+
+    def test_splits_at_top_level_blank_lines(self):
+        self.assertEqual(split_blocks('<div>\n\nInside\n\n</div>\n\nAfter'), ['<div>\n\nInside\n\n</div>', 'After'])
+        self.assertEqual(split_blocks('- a\n\n- b\n\nPara'), ['- a\n\n- b', 'Para'])
+        self.assertEqual(split_blocks('One\r\n\r\n\r\nTwo\n```\nx\n\ny\n```'), ['One', 'Two\n```\nx\n\ny\n```'])
+
+    def test_unchanged_blocks_come_from_cache(self):
+        render_blocks('First\n\nSecond')
+        with mock.patch('core.rendering._markdown', side_effect=AssertionError('re-rendered')):
+            self.assertEqual(render_blocks('Second\n\nFirst'), [
+                (block_id('Second'), '<p>Second</p>'), (block_id('First'), '<p>First</p>'),
+            ])
+
+    def test_preview_omits_known_blocks(self):
+        self.client.force_login(get_user_model().objects.create_user('editor', password='x', is_staff=True))
+        response = self.client.post(reverse('post_preview'), {
+            'markdown': 'First\n\nSecond', 'known': [block_id('First'), 'stale'],
+        })
+        self.assertEqual(response.json(), {'blocks': [
+            {'id': block_id('First')}, {'id': block_id('Second'), 'html': '<p>Second</p>'},
+        ]})
+
+    def test_preview_is_staff_only(self):
+        url = reverse('post_preview')
+        self.assertEqual(self.client.post(url, {'markdown': 'x'}).status_code, 302)
+        self.client.force_login(get_user_model().objects.create_user('reader', password='x'))
+        self.assertEqual(self.client.post(url, {'markdown': 'x'}).status_code, 302)
+        self.client.force_login(get_user_model().objects.create_user('editor', password='x', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+class HighlightingTests(TestCase):
+    SNIPPETS = '''Fenced:
+
+```python
+def flow_rate(area, velocity):
+    return area * velocity
+```
+
+Unlabelled, with highlighted lines:
+
+~~~ {hl_lines="1"}
+print('left to fenced_code')
+~~~
+
+Indented:
+
+    #!/usr/bin/env python
+    print('shebang')
+
+    :::c
+    int main(void) { return 0; }
+'''
+
+    def setUp(self):
+        cache.clear()
+        _highlight.cache_clear()
+
+    def test_output_matches_stock_codehilite(self):
+        stock = markdown.markdown(
+            self.SNIPPETS,
+            extensions=['markdown.extensions.extra', 'markdown.extensions.codehilite', 'markdown.extensions.toc'],
+            extension_configs={'markdown.extensions.codehilite': {'pygments_style': settings.PYGMENTS_STYLE}},
+        )
+        self.assertEqual(render_markdown(self.SNIPPETS)[0], stock)
+
+    def test_snippet_is_highlighted_once_across_posts(self):
+        with mock.patch.object(CodeHilite, 'hilite', autospec=True, side_effect=CodeHilite.hilite) as hilite:
+            render_markdown(POST_BODY)
+            render_markdown(f'# Another post\n\n{POST_BODY}')
+            self.assertEqual(hilite.call_count, 1)
+
+            # A fresh worker has an empty LRU but shares the cache.
+            _highlight.cache_clear()
+            render_markdown(POST_BODY)
+            self.assertEqual(hilite.call_count, 1)
+
+    def test_committed_stylesheet_is_current(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'pygments.css')
+            call_command('build_pygments_css', output=output, stdout=io.StringIO())
+            with open(output, 'rb') as built, open(settings.BASE_DIR / 'assets' / 'css' / 'pygments.css', 'rb') as committed:
+                self.assertEqual(committed.read(), built.read())
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_LENGTH=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    BODY = '<p>A paragraph that compresses well.</p>\n' * 20
+
+    def compress(self, response, accept='gzip, deflate, br', request=None):
+        request = request or RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip(self):
+        response = HttpResponse(self.BODY, headers={'ETag': '"abc"'})
+        response = self.compress(response, accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), self.BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_below_threshold(self):
+        response = self.compress(HttpResponse('<p>short</p>'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'<p>short</p>')
+
+    def test_streaming_skipped(self):
+        response = self.compress(StreamingHttpResponse(iter([self.BODY])))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.BODY)
+
+    def test_incompressible_type_skipped(self):
+        response = self.compress(HttpResponse(self.BODY, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_already_encoded_skipped(self):
+        response = self.compress(HttpResponse(self.BODY, headers={'Content-Encoding': 'identity'}))
+        self.assertEqual(response['Content-Encoding'], 'identity')
+        self.assertEqual(response.content.decode(), self.BODY)
+
+    def test_not_accepted(self):
+        response = self.compress(HttpResponse(self.BODY), accept='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_brotli_preferred(self):
+        with mock.patch('core.middleware.brotli') as brotli:
+            brotli.compress.return_value = b'brotli'
+            response = self.compress(HttpResponse(self.BODY))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, b'brotli')
+
+    def test_csrf_pages_use_padded_gzip(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br, gzip')
+        get_token(request)
+        with mock.patch('core.middleware.brotli') as brotli:
+            response = self.compress(HttpResponse(self.BODY), request=request)
+        brotli.compress.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), self.BODY)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_RETRY_SECONDS=30)
+class ReadReplicaTests(TestCase):
+    """
+    Two SQLite files stand in for the replicas. Each holds a skill the primary
+    doesn't have, so a page shows which database it was read from.
+    """
+    def setUp(self):
+        cache.clear()
+        SiteSettings.objects.create(site_name='Test Portfolio')
+        Skill.objects.create(name='Primary Skill', level=50)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for alias in ('replica1', 'replica2'):
+            self.add_replica(alias, os.path.join(self.directory, f'{alias}.sqlite3'))
+        routers._turn = itertools.count()
+        routers._down_until.clear()
+        self.addCleanup(routers._down_until.clear)
+
+    def add_replica(self, alias, path, schema=True):
+        connections.settings[alias] = {**connections.settings['default'], 'NAME': path}
+        self.addCleanup(connections.settings.pop, alias)
+        self.addCleanup(connections.__delitem__, alias)
+        self.addCleanup(lambda: connections[alias].close())
+        if schema:
+            with connections[alias].schema_editor() as editor:
+                for model in apps.get_app_config('core').get_models():
+                    editor.create_model(model)
+            SiteSettings.objects.using(alias).create(site_name='Test Portfolio')
+            Skill.objects.using(alias).create(name=f'Skill on {alias}', level=50)
+        # Opened read-only, as settings do for SQLite replicas.
+        connections[alias].close()
+        connections.settings[alias]['NAME'] = f'file:{path}?mode=ro'
+
+    def break_replica(self, alias):
+        connections[alias].close()
+        connections.settings[alias]['NAME'] = '/nonexistent/replica.sqlite3'
+
+    def test_round_robin(self):
+        self.assertEqual([routers.choose_replica() for _ in range(4)], ['replica1', 'replica2'] * 2)
+
+    def test_failover(self):
+        self.break_replica('replica1')
+        self.assertEqual([routers.choose_replica() for _ in range(3)], ['replica2'] * 3)
+        self.assertIn('replica1', routers._down_until)
+
+        # Not retried until REPLICA_RETRY_SECONDS have passed.
+        connections.settings['replica1']['NAME'] = connections.settings['replica2']['NAME']
+        self.assertNotIn('replica1', [routers.choose_replica() for _ in range(2)])
+        with mock.patch('core.routers.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertIn('replica1', [routers.choose_replica() for _ in range(2)])
+
+    def test_missing_replica_file_not_created(self):
+        path = os.path.join(self.directory, 'missing.sqlite3')
+        connections['replica1'].close()
+        connections.settings['replica1']['NAME'] = f'file:{path}?mode=ro'
+        self.assertEqual(routers.choose_replica(), 'replica2')
+        self.assertFalse(os.path.exists(path))
+
+    def test_replica_failing_mid_request_falls_back_to_primary(self):
+        # Answers SELECT 1 but has no tables.
+        path = os.path.join(self.directory, 'empty.sqlite3')
+        open(path, 'wb').close()
+        self.add_replica('replica3', path, schema=False)
+        with override_settings(DATABASE_REPLICAS=['replica3']):
+            response = self.client.get(reverse('skill_list'))
+        self.assertContains(response, 'Primary Skill')
+        self.assertIn('replica3', routers._down_until)
+
+    def test_all_replicas_down_uses_primary(self):
+        self.break_replica('replica1')
+        self.break_replica('replica2')
+        self.assertIsNone(routers.choose_replica())
+        self.assertContains(self.client.get(reverse('skill_list')), 'Primary Skill')
+
+    def test_public_pages_read_from_replicas(self):
+        response = self.client.get(reverse('skill_list'))
+        self.assertContains(response, 'Skill on replica1')
+        self.assertNotContains(response, 'Primary Skill')
+        self.assertIsNone(routers._replica.get())
+
+    def test_staff_read_from_primary(self):
+        self.client.force_login(get_user_model().objects.create_user('editor', password='x', is_staff=True))
+        self.assertContains(self.client.get(reverse('skill_list')), 'Primary Skill')
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.client.post(reverse('skill_list'))
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertContains(self.client.get(reverse('skill_list')), 'Primary Skill')
+
+    def test_views_without_opt_in_read_from_primary(self):
+        with mock.patch('core.routers.choose_replica') as choose_replica:
+            self.client.get(reverse('media', args=['missing.jpg']))
+        choose_replica.assert_not_called()
+
+    @override_settings(REPLICA_PIN_SECONDS=10)
+    def test_cache_invalidated_again_after_replication_lag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('skills')
+        committed = get_versions(['skills'])
+        self.assertEqual(get_versions(['skills']), committed)
+        with mock.patch('core.cache.time.time', return_value=time.time() + 11):
+            settled = get_versions(['skills'])
+            self.assertNotEqual(settled, committed)
+            self.assertEqual(get_versions(['skills']), settled)
+
+
+class ContentBundleTests(MediaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        SiteSettings.objects.create(site_name='Bundled Portfolio')
+        Skill.objects.create(name='CAD', level=80)
+        project = Project.objects.create(title='Press', short_description='x', technologies='CAD')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectImage.objects.create(project=project, image=SimpleUploadedFile('front.jpg', b'front view'), caption='Front')
+        # Uploaded before content addressing.
+        os.makedirs(default_storage.path('projects'))
+        with open(default_storage.path('projects/side.jpg'), 'wb') as f:
+            f.write(b'side view')
+        ProjectImage.objects.create(project=project, image='projects/side.jpg', caption='Side')
+        self.post = Post.objects.create(
+            title='Teardown', markdown_content='x', is_published=True,
+            published_date=timezone.now() - datetime.timedelta(days=3),
+        )
+        self.post.tags.set([Tag.objects.create(name='Hydraulics'), Tag.objects.create(name='Pumps')])
+        Post.objects.filter(pk=self.post.pk).update(updated_date=timezone.now() - datetime.timedelta(days=2))
+        self.post.refresh_from_db()
+
+    def export(self, **kwargs):
+        path = os.path.join(self.directory, 'content.tar.gz')
+        with open(path, 'wb') as f:
+            export_bundle(f, **kwargs)
+        return path
+
+    def empty_site(self):
+        """Delete all content and switch to an empty MEDIA_ROOT."""
+        for label in reversed(list(NATURAL_KEYS)):
+            apps.get_model(label)._base_manager.all().delete()
+        MediaBlob.objects.all().delete()
+        MediaTestMixin.setUp(self)
+
+    def assertImagesStored(self):
+        images = {image.caption: image.image for image in ProjectImage.objects.all()}
+        self.assertEqual(sorted(images), ['Front', 'Side'])
+        for caption, content in (('Front', b'front view'), ('Side', b'side view')):
+            with self.subTest(caption=caption):
+                self.assertTrue(images[caption].name.startswith('cas/'))
+                with default_storage.open(images[caption].name) as f:
+                    self.assertEqual(f.read(), content)
+                self.assertEqual(MediaBlob.objects.get(name=images[caption].name).refcount, 1)
+
+    def test_round_trip(self):
+        path = self.export()
+        self.empty_site()
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = import_bundle(path)
+        self.assertEqual(stats['core.ProjectImage'], {'created': 2, 'updated': 0, 'skipped': 0})
+        self.assertEqual(SiteSettings.objects.get().site_name, 'Bundled Portfolio')
+        post = Post.objects.get(slug='teardown')
+        self.assertEqual(sorted(post.tags.values_list('slug', flat=True)), ['hydraulics', 'pumps'])
+        self.assertEqual(post.published_date, self.post.published_date)
+        self.assertEqual(post.updated_date, self.post.updated_date)
+        self.assertImagesStored()
+
+    def test_reimport_matches_existing_rows(self):
+        path = self.export()
+        self.empty_site()
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                stats = import_bundle(path)
+        self.assertEqual(stats['core.ProjectImage'], {'created': 0, 'updated': 2, 'skipped': 0})
+        self.assertEqual(stats['core.Post'], {'created': 0, 'updated': 1, 'skipped': 0})
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertImagesStored()
+
+    def test_import_into_source_site(self):
+        # The legacy image row is matched by its old name and moved to storage by hash.
+        path = self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            import_bundle(path)
+        self.assertImagesStored()
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_on_conflict(self):
+        path = self.export()
+        Post.objects.filter(pk=self.post.pk).update(title='Edited')
+
+        call_command('import_content', path, on_conflict='skip', stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Edited')
+
+        with self.assertRaisesMessage(CommandError, 'already exists'):
+            call_command('import_content', path, on_conflict='error', stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Edited')
+
+        call_command('import_content', path, on_conflict='update', stdout=io.StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Teardown')
+
+    def test_dry_run(self):
+        path = self.export()
+        self.empty_site()
+        stats = import_bundle(path, dry_run=True)
+        self.assertEqual(stats['core.Post']['created'], 1)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(default_storage.exists('cas'))
+
+    def test_without_media(self):
+        path = self.export(include_media=False)
+        self.empty_site()
+        import_bundle(path)
+        self.assertEqual(ProjectImage.objects.get(caption='Side').image.name, 'projects/side.jpg')
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_rejects_other_archives(self):
+        path = os.path.join(self.directory, 'other.tar.gz')
+        with tarfile.open(path, 'w:gz') as tar:
+            tar.addfile(tarfile.TarInfo('notes.txt'), io.BytesIO())
+        with self.assertRaisesMessage(BundleError, 'manifest.json is missing'):
+            import_bundle(path)
+
+    def test_unreadable_bundles(self):
+        not_archive = os.path.join(self.directory, 'notes.tar.gz')
+        with open(not_archive, 'w') as f:
+            f.write('not a bundle')
+        corrupt = os.path.join(self.directory, 'corrupt.tar.gz')
+        with tarfile.open(corrupt, 'w:gz') as tar:
+            manifest = json.dumps({'format': 'portfolio-content', 'version': 1, 'models': {'core.Skill': 1}}).encode()
+            for name, data in (('manifest.json', manifest), ('core.skill.jsonl', b'{"name": "CAD", \n')):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        for path, message in ((not_archive, 'Not a readable bundle'), (corrupt, 'line 1 is not valid JSON')):
+            with self.subTest(path=path), self.assertRaisesMessage(CommandError, message):
+                call_command('import_content', path, stdout=io.StringIO())
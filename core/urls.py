@@ -5,6 +5,8 @@ urlpatterns = [
     # Class-based views
     path('', views.HomeView.as_view(), name='home'),
     path('blog/', views.BlogListView.as_view(), name='blog_list'),
+    path('preview/markdown/', views.post_preview, name='post_preview'),
+    path('metrics', views.metrics, name='metrics'),
     path('blog/<slug:slug>/', views.PostDetailView.as_view(), name='post_detail'),
     path('project/<slug:slug>/', views.ProjectDetailView.as_view(), name='project_detail'),
     path('contact/', views.ContactView.as_view(), name='contact'),
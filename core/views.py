@@ -1,3 +1,6 @@
+import os
+import stat
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, TemplateView, FormView
 from django.views.generic.edit import CreateView
@@ -6,19 +9,66 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
 from django.urls import reverse_lazy
-import markdown
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_POST, require_safe
 from .models import *
+from . import metrics as core_metrics
+from .cache import get_cached_page, page_cache_key, set_cached_page
+from .media import media_response
+from .rendering import render_blocks, render_markdown
+from .skills import get_skill_groups
 
-class HomeView(TemplateView):
-    template_name = 'core/home.html'
-    
+def send_contact_mail(subject, body):
+    """Send a contact notification, recording how long the mail server took."""
+    try:
+        with core_metrics.MAIL_SEND_SECONDS.time():
+            send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [settings.CONTACT_EMAIL], fail_silently=False)
+    except Exception:
+        core_metrics.MAIL_SEND_ERRORS.inc()
+        raise
+
+class CachedPageMixin:
+    """
+    Cache the rendered page for anonymous GET requests, keyed on the path, the
+    ``cache_query_params`` the view reads and the version tokens of
+    ``cache_namespaces``. Saving a model in any of those namespaces (or
+    publishing a scheduled post) changes the key.
+    """
+    cache_namespaces = ()
+    cache_query_params = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, self.cache_namespaces, self.cache_query_params)
+        cached = get_cached_page(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and request.method == 'GET':
+            response.add_post_render_callback(lambda rendered: set_cached_page(key, rendered))
+        return response
+
+class HomeContextMixin:
+    """
+    Context for every view that renders core/home.html. Its sections are
+    fragment-cached, so they must never be rendered from a partial context.
+    """
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
             'site_settings': SiteSettings.objects.first(),
             'about': About.objects.first(),
-            'skills': Skill.objects.all(),
-            'featured_projects': Project.objects.filter(featured=True).order_by('order')[:3],
+            # Called by the template only if the skills fragment isn't cached.
+            'skill_groups': get_skill_groups,
+            'featured_projects': Project.objects.filter(featured=True).prefetch_related('images').order_by('order')[:3],
             'all_projects': Project.objects.all().order_by('-featured', 'order'),
             'education': Education.objects.all(),
             'certifications': Certification.objects.all(),
@@ -27,15 +77,22 @@ class HomeView(TemplateView):
         })
         return context
 
-class BlogListView(ListView):
+class HomeView(HomeContextMixin, TemplateView):
+    template_name = 'core/home.html'
+    use_read_replica = True
+
+class BlogListView(CachedPageMixin, ListView):
     model = Post
     template_name = 'core/blog_list.html'
     context_object_name = 'posts'
     paginate_by = 6
     ordering = ['-published_date']
+    cache_namespaces = ('site', 'posts')
+    cache_query_params = ('page',)
+    use_read_replica = True
     
     def get_queryset(self):
-        return Post.objects.filter(is_published=True).order_by('-published_date')
+        return Post.objects.filter(is_published=True).prefetch_related('tags').order_by('-published_date')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -45,48 +102,53 @@ class BlogListView(ListView):
         })
         return context
 
-class PostDetailView(DetailView):
+class PostDetailView(CachedPageMixin, DetailView):
     model = Post
     template_name = 'core/post_detail.html'
     context_object_name = 'post'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
+    cache_namespaces = ('site', 'posts')
+    use_read_replica = True
     
     def get_queryset(self):
-        return Post.objects.filter(is_published=True)
+        # Staff can open drafts (e.g. from the admin's preview link); their
+        # requests bypass the page cache.
+        posts = Post.objects.prefetch_related('tags')
+        if self.request.user.is_staff:
+            return posts
+        return posts.filter(is_published=True)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         post = self.object
         
         # Convert markdown to HTML
-        md = markdown.Markdown(extensions=[
-            'markdown.extensions.extra',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.toc',
-        ])
-        post_content_html = md.convert(post.markdown_content)
+        post_content_html, toc = render_markdown(post.markdown_content)
         
         context.update({
             'post_content': post_content_html,
             'site_settings': SiteSettings.objects.first(),
-            'toc': md.toc if hasattr(md, 'toc') else '',
+            'toc': toc,
         })
         return context
 
-class ProjectDetailView(DetailView):
+class ProjectDetailView(CachedPageMixin, DetailView):
     model = Project
+    queryset = Project.objects.prefetch_related('images')
     template_name = 'core/project_detail.html'
     context_object_name = 'project'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
+    cache_namespaces = ('site', 'projects')
+    use_read_replica = True
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['site_settings'] = SiteSettings.objects.first()
         return context
 
-class ContactView(CreateView):
+class ContactView(HomeContextMixin, CreateView):
     model = ContactMessage
     template_name = 'core/home.html'  # Redirects to home where contact form is located
     fields = ['name', 'email', 'subject', 'message']
@@ -97,23 +159,22 @@ class ContactView(CreateView):
         
         # Send email notification
         contact_message = self.object
-        send_mail(
+        core_metrics.CONTACT_SUBMISSIONS.inc(result='accepted')
+        send_contact_mail(
             f'Portfolio Contact: {contact_message.subject}',
             f'From: {contact_message.name} ({contact_message.email})\n\n{contact_message.message}',
-            settings.DEFAULT_FROM_EMAIL,
-            [settings.CONTACT_EMAIL],
-            fail_silently=False,
         )
         
         messages.success(self.request, 'Thank you for your message! I will get back to you soon.')
         return response
     
     def form_invalid(self, form):
+        core_metrics.CONTACT_SUBMISSIONS.inc(result='invalid')
         messages.error(self.request, 'There was an error with your submission. Please check the form and try again.')
         return super().form_invalid(form)
 
 # Alternative approach for contact using FormView if you want more control
-class ContactFormView(FormView):
+class ContactFormView(HomeContextMixin, FormView):
     template_name = 'core/home.html'
     success_url = reverse_lazy('home')
     
@@ -132,23 +193,24 @@ class ContactFormView(FormView):
         )
         
         # Send email notification
-        send_mail(
+        core_metrics.CONTACT_SUBMISSIONS.inc(result='accepted')
+        send_contact_mail(
             f'Portfolio Contact: {subject}',
             f'From: {name} ({email})\n\n{message}',
-            settings.DEFAULT_FROM_EMAIL,
-            [settings.CONTACT_EMAIL],
-            fail_silently=False,
         )
         
         messages.success(self.request, 'Thank you for your message! I will get back to you soon.')
         return super().form_valid(form)
 
 # Project List View (if you want a dedicated projects page)
-class ProjectListView(ListView):
+class ProjectListView(CachedPageMixin, ListView):
     model = Project
+    queryset = Project.objects.prefetch_related('images')
     template_name = 'core/project_list.html'
     context_object_name = 'projects'
     ordering = ['-featured', 'order']
+    cache_namespaces = ('site', 'projects')
+    use_read_replica = True
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -156,24 +218,15 @@ class ProjectListView(ListView):
         return context
 
 # Skills View (if you want a dedicated skills page)
-class SkillListView(ListView):
-    model = Skill
+class SkillListView(CachedPageMixin, TemplateView):
     template_name = 'core/skill_list.html'
-    context_object_name = 'skills'
-    ordering = ['category', '-level', 'name']
+    cache_namespaces = ('site', 'skills')
+    use_read_replica = True
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['site_settings'] = SiteSettings.objects.first()
-        
-        # Group skills by category
-        skills_by_category = {}
-        for skill in context['skills']:
-            if skill.category not in skills_by_category:
-                skills_by_category[skill.category] = []
-            skills_by_category[skill.category].append(skill)
-        
-        context['skills_by_category'] = skills_by_category
+        context['skill_groups'] = get_skill_groups()
         return context
 
 # Function-based view for backward compatibility (optional)
@@ -191,15 +244,60 @@ def contact_legacy(request):
             message=message
         )
         
-        send_mail(
+        core_metrics.CONTACT_SUBMISSIONS.inc(result='accepted')
+        send_contact_mail(
             f'Portfolio Contact: {subject}',
             f'From: {name} ({email})\n\n{message}',
-            settings.DEFAULT_FROM_EMAIL,
-            [settings.CONTACT_EMAIL],
-            fail_silently=False,
         )
         
         messages.success(request, 'Thank you for your message! I will get back to you soon.')
         return redirect('home')
     
-    return redirect('home')
\ No newline at end of file
+    return redirect('home')
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file with Range, conditional-request and X-Sendfile support."""
+    try:
+        full_path = default_storage.path(path)
+    except NotImplementedError:
+        # Remote storage (e.g. S3) serves its own files.
+        return redirect(default_storage.url(path))
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+
+    try:
+        file_stat = os.stat(full_path)
+    except OSError:
+        raise Http404('File not found')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found')
+    return media_response(request, path, full_path, file_stat)
+
+@staff_member_required
+@require_POST
+def post_preview(request):
+    """
+    Live Markdown preview for the post admin. Renders ``markdown`` block by
+    block; blocks listed in ``known`` are returned without HTML because the
+    editor already has them.
+    """
+    known = set(request.POST.getlist('known'))
+    blocks = [
+        {'id': block_id} if block_id in known else {'id': block_id, 'html': html}
+        for block_id, html in render_blocks(request.POST.get('markdown', ''))
+    ]
+    return JsonResponse({'blocks': blocks})
+
+@require_safe
+def metrics(request):
+    """Prometheus scrape endpoint. 404 unless METRICS_ENABLED; needs the bearer token if METRICS_TOKEN is set."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() != 'bearer' or not constant_time_compare(token, settings.METRICS_TOKEN):
+            response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+    return HttpResponse(core_metrics.exposition(), content_type=core_metrics.CONTENT_TYPE)
@@ -13,11 +13,12 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-load_dotenv()
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# An explicit path skips find_dotenv()'s directory walk on every boot.
+load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -40,16 +41,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'compressor',
     'core',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReadReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,13 +63,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cache_versions',
+            ],
+            # Parse each template once per process. Django's autoreloader
+            # clears this cache when a template changes under runserver.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -85,6 +96,85 @@ DATABASES = {
     }
 }
 
+# Read replicas for the public pages (see core.routers). DB_REPLICAS is a
+# comma-separated list of database files when the primary is SQLite (e.g.
+# copies of db.sqlite3 for local testing), or of hosts for PostgreSQL.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        # Read-only, so a missing file fails instead of becoming a new empty database.
+        location = {'NAME': f'file:{replica.strip()}?mode=ro'}
+    else:
+        location = {'HOST': replica.strip()}
+    DATABASES[alias] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# A replica that can't be reached is skipped for this long.
+REPLICA_RETRY_SECONDS = 30
+# After a POST (contact form, admin save) the client reads from the primary
+# for this long, which should cover replication lag. Pages and fragments
+# cached during that window are invalidated again once it has passed.
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Cached fragments and pages are invalidated by replacing version tokens in
+# this cache (see core.cache), so it must be shared by every process that
+# serves or edits content: gunicorn workers, cron jobs like publish_scheduled,
+# import_content. A process-local backend such as LocMemCache would leave the
+# other processes serving stale pages. The default file cache is shared by
+# processes on one machine; with several machines, use Redis, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    }
+}
+if CACHES['default']['BACKEND'].endswith('.FileBasedCache'):
+    # Each cull lists the whole directory, so leave room before it starts.
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 5000}
+
+# Tests use a throwaway file cache of their own (see core.testing).
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Rendered partials are keyed on content versions and invalidated on save.
+# They also expire daily, in case an invalidation is ever missed.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Whole pages (blog, post, project and skill pages) are keyed the same way.
+# They still expire daily so the footer's {% now %} year stays current.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Response compression (core.middleware.CompressionMiddleware). Brotli is
+# used when the brotli package is installed and the client accepts it,
+# otherwise gzip. Pages with a CSRF token always get gzip, which is padded
+# against BREACH. Smaller responses aren't worth compressing.
+RESPONSE_COMPRESSION_MIN_LENGTH = 1024
+RESPONSE_COMPRESSION_BROTLI_QUALITY = 5
+
+
+# Metrics (core.metrics), served in the Prometheus text format at /metrics.
+# With METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>".
+# Under gunicorn, point METRICS_DIR at an empty directory (e.g. on tmpfs) so
+# every worker's values are exported.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+
+# Code blocks in posts are highlighted with CSS classes; build_pygments_css
+# writes the matching stylesheet for this style.
+PYGMENTS_STYLE = 'monokai'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,14 +217,52 @@ STATICFILES_DIRS = [BASE_DIR / 'assets']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How core.views.serve_media delivers files: 'python' (FileResponse, with
+# Range support), or hand-off to the web server via 'x-accel-redirect' (nginx)
+# or 'x-sendfile' (Apache/lighttpd).
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'python')
+# Internal nginx location aliased to MEDIA_ROOT, used with X-Accel-Redirect.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Uploads are stored by content hash (see core.storage). Set MEDIA_STORAGE=s3
+# and MEDIA_S3_ENDPOINT_URL (e.g. a local MinIO) to keep them in a bucket.
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'filesystem')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.ContentAddressedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+if MEDIA_STORAGE == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'core.storage.ContentAddressedS3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('MEDIA_BUCKET', 'media'),
+            'endpoint_url': os.getenv('MEDIA_S3_ENDPOINT_URL'),
+            'access_key': os.getenv('MEDIA_S3_ACCESS_KEY'),
+            'secret_key': os.getenv('MEDIA_S3_SECRET_KEY'),
+            'custom_domain': os.getenv('MEDIA_CUSTOM_DOMAIN'),
+            'querystring_auth': False,
+        },
+    }
+
 STATICFILES_FINDERS = (
     'django.contrib.staticfiles.finders.FileSystemFinder',
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',
-    'compressor.finders.CompressorFinder',
 )
 
 COMPRESS_ENABLED = not DEBUG
 
+# Only load django-compressor when it is actually compressing, so development
+# servers and management commands don't import it on every start.
+if COMPRESS_ENABLED:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index('core'), 'compressor')
+    STATICFILES_FINDERS += ('compressor.finders.CompressorFinder',)
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))